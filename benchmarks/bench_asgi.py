@@ -0,0 +1,100 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Compare the ASGI adapter with calling the WSGI application directly.
+
+Usage: python benchmarks/bench_asgi.py [REQUESTS [CONCURRENCY]]
+"""
+import asyncio
+import io
+import sys
+import time
+
+import zope.processlifetime
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+from zope.configuration import xmlconfig
+from zope.event import notify
+from zope.security import checker
+
+import zope.app.wsgi
+from zope import component
+from zope.app.wsgi.asgi import ASGIApplication
+from zope.app.wsgi.testing import IndexView
+
+
+def makeApplication():
+    xmlconfig.file('ftesting.zcml', zope.app.wsgi)
+    component.provideAdapter(IndexView, name='index.html')
+    checker.defineChecker(
+        IndexView, checker.NamesChecker(['browserDefault', '__call__']))
+    db = DB(MappingStorage())
+    notify(zope.processlifetime.DatabaseOpened(db))
+    return zope.app.wsgi.WSGIPublisherApplication(db)
+
+
+def benchWSGI(app, requests):
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/index.html',
+                   'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+                   'wsgi.input': io.BytesIO()}
+        b''.join(app(environ, start_response))
+    return time.perf_counter() - start
+
+
+def benchASGI(app, requests, concurrency):
+    asgi_app = ASGIApplication(app)
+    scope = {'type': 'http', 'method': 'GET', 'path': '/index.html'}
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        pass
+
+    async def client(count):
+        for i in range(count):
+            await asgi_app(scope, receive, send)
+
+    async def main():
+        per_client, rest = divmod(requests, concurrency)
+        await asyncio.gather(*[
+            client(per_client + (i < rest)) for i in range(concurrency)])
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    asgi_app.executor.shutdown()
+    return time.perf_counter() - start
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    requests = int(args[0]) if args else 2000
+    concurrency = int(args[1]) if len(args) > 1 else 8
+    app = makeApplication()
+    # Warm up caches and lazily imported modules.
+    benchWSGI(app, 50)
+    for name, elapsed in [
+            ('wsgi', benchWSGI(app, requests)),
+            ('asgi', benchASGI(app, requests, concurrency))]:
+        print('%-5s %6d requests in %7.3fs  %8.1f req/s' % (
+            name, requests, elapsed, requests / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Benchmark the WSGI publishing hot path.
+
+The application is driven in-process with views returning a small page,
+raising an error and returning files of several sizes, against a
+MappingStorage and a DemoStorage.  The ``http()`` function of
+``BrowserLayer`` and the startup via ``getWSGIApplication`` are measured
+too.
+
+Usage:
+
+    python benchmarks/bench_publisher.py -o before.json
+    # ... change something ...
+    python benchmarks/bench_publisher.py -o after.json -c before.json
+
+With ``-c`` the results are compared to an earlier run and the exit status
+is 1 if a case got slower by more than the threshold.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+import zope.processlifetime
+from ZODB.DB import DB
+from ZODB.DemoStorage import DemoStorage
+from ZODB.MappingStorage import MappingStorage
+from zope.event import notify
+from zope.security import checker
+
+import zope.app.wsgi
+from zope import component
+from zope.app.wsgi.testing import ErrorRaisingView
+from zope.app.wsgi.testing import FileView
+from zope.app.wsgi.testing import IndexView
+from zope.app.wsgi.testlayer import BrowserLayer
+from zope.app.wsgi.testlayer import http
+
+
+REPORT_VERSION = 1
+FILE_SIZES = {'1k': 1024, '64k': 65536, '1m': 1048576}
+
+ZOPE_CONF = """
+site-definition %s
+
+<zodb>
+  <mappingstorage />
+</zodb>
+
+<eventlog>
+  <logfile>
+    path STDERR
+    level error
+  </logfile>
+</eventlog>
+"""
+
+STARTUP_SCRIPT = textwrap.dedent("""
+    import sys, time
+    start = time.perf_counter()
+    from zope.app.wsgi import getWSGIApplication
+    getWSGIApplication(sys.argv[1])
+    print(time.perf_counter() - start)
+""")
+
+
+def makeFileView(path):
+    class SizedFileView(FileView):
+        def __call__(self):
+            self.request.response.setHeader(
+                'content-type', 'application/octet-stream')
+            return open(path, 'rb')
+    return SizedFileView
+
+
+def registerViews(temp_dir):
+    views = {'index.html': IndexView, 'error.html': ErrorRaisingView}
+    for name, size in FILE_SIZES.items():
+        path = os.path.join(temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        views['file-%s' % name] = makeFileView(path)
+    for name, view in views.items():
+        component.provideAdapter(view, name=name)
+        checker.defineChecker(
+            view, checker.NamesChecker(['browserDefault', '__call__']))
+
+
+def makeApplication(storage):
+    db = DB(storage)
+    notify(zope.processlifetime.DatabaseOpened(db))
+    return zope.app.wsgi.WSGIPublisherApplication(db)
+
+
+def publisher(app, path):
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    def run():
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+                   'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+                   'wsgi.input': io.BytesIO()}
+        result = app(environ, start_response)
+        for chunk in result:
+            pass
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+    return run
+
+
+def measure(func, number, repeat):
+    func()  # warm up
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def measureStartup(temp_dir, repeat):
+    site_zcml = os.path.join(
+        os.path.dirname(zope.app.wsgi.__file__), 'ftesting.zcml')
+    zopeconf = os.path.join(temp_dir, 'zope.conf')
+    with open(zopeconf, 'w') as f:
+        f.write(ZOPE_CONF % site_zcml)
+    return [float(subprocess.check_output(
+        [sys.executable, '-c', STARTUP_SCRIPT, zopeconf],
+        stderr=subprocess.DEVNULL))
+        for i in range(repeat)]
+
+
+def run(number, repeat, cases=None):
+    """Run the benchmark cases and return the results."""
+    layer = BrowserLayer(zope.app.wsgi, allowTearDown=True)
+    layer.setUp()
+    layer.testSetUp()
+    temp_dir = tempfile.mkdtemp()
+    timings = {}
+    apps = {}
+    try:
+        registerViews(temp_dir)
+        apps = {
+            'mapping': makeApplication(MappingStorage()),
+            'demo': makeApplication(DemoStorage(base=MappingStorage())),
+        }
+        funcs = {}
+        for storage, app in apps.items():
+            for view in ['index.html', 'error.html'] + [
+                    'file-%s' % name for name in FILE_SIZES]:
+                funcs['%s:%s' % (storage, view)] = publisher(
+                    app, '/' + view)
+        layer_app = layer.make_wsgi_app()
+        funcs['layer:http'] = lambda: http(
+            layer_app, b'GET /index.html HTTP/1.1\n\n').getBody()
+
+        for name, func in funcs.items():
+            if cases is None or name in cases:
+                timings[name] = measure(func, number, repeat)
+        if cases is None or 'startup' in cases:
+            timings['startup'] = measureStartup(temp_dir, repeat)
+    finally:
+        for app in apps.values():
+            app.db.close()
+        layer.testTearDown()
+        layer.tearDown()
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
+
+    return {
+        'version': REPORT_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'number': number,
+        'repeat': repeat,
+        'results': {
+            name: {'best': min(values),
+                   'median': statistics.median(values)}
+            for name, values in timings.items()},
+    }
+
+
+def compare(baseline, report, threshold):
+    """Print how the results changed and return the regressed cases."""
+    regressions = []
+    for name, result in sorted(report['results'].items()):
+        old = baseline['results'].get(name)
+        if old is None:
+            print('%-20s %10.1f us  (new)' % (name, result['best'] * 1e6))
+            continue
+        change = result['best'] / old['best'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-20s %10.1f us -> %10.1f us  %+6.1f%%%s' % (
+            name, old['best'] * 1e6, result['best'] * 1e6, change * 100,
+            flag))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--number', type=int, default=200,
+                        help='requests per repetition')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of repetitions, the best one counts')
+    parser.add_argument('-o', '--output', help='write the results as JSON')
+    parser.add_argument('-c', '--compare',
+                        help='compare to results written earlier')
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                        help='slowdown reported as regression (0.1 = 10%%)')
+    parser.add_argument('cases', nargs='*', help='run only these cases')
+    options = parser.parse_args(args)
+
+    # The error view logs a traceback for every request.
+    logging.disable(logging.ERROR)
+    report = run(options.number, options.repeat, options.cases or None)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, options.threshold):
+            return 1
+    else:
+        for name, result in sorted(report['results'].items()):
+            print('%-20s %10.1f us  (median %.1f us)' % (
+                name, result['best'] * 1e6, result['median'] * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
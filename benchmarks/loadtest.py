@@ -0,0 +1,222 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Load test the publisher over a loopback HTTP server.
+
+The application is served by a threaded ``wsgiref`` server on a random
+local port and driven by concurrent clients for a fixed duration.
+Reported are the throughput, latency percentiles, the error rate and the
+number of requests retried because of ZODB conflicts.
+
+Usage:
+
+    python benchmarks/loadtest.py -c 16 -d 10
+    python benchmarks/loadtest.py -c 16 --pool-size 4 --write-ratio 0.1
+    python benchmarks/loadtest.py -C zope.conf --path /some/page
+
+Without ``-C`` a test application with a MappingStorage is used.  Its
+``/index.html`` returns a small page and ``/increment.html`` modifies the
+root folder, so ``--write-ratio`` causes conflicts.
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+import wsgiref.simple_server
+
+import zope.processlifetime
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+from zope.configuration import xmlconfig
+from zope.event import notify
+from zope.publisher.interfaces import IEndRequestEvent
+from zope.security import checker
+from zope.security.proxy import removeSecurityProxy
+
+import zope.app.wsgi
+from zope import component
+from zope.app.wsgi.prefork import ThreadingWSGIServer
+from zope.app.wsgi.testing import FileView
+from zope.app.wsgi.testing import IndexView
+
+
+class IncrementView(FileView):
+
+    def __init__(self, context, request):
+        super().__init__(context, request)
+        self.context = removeSecurityProxy(context)
+
+    def __call__(self):
+        self.context.hits = getattr(self.context, 'hits', 0) + 1
+        return str(self.context.hits)
+
+
+def makeApplication(pool_size):
+    xmlconfig.file('ftesting.zcml', zope.app.wsgi)
+    for name, view in [('index.html', IndexView),
+                       ('increment.html', IncrementView)]:
+        component.provideAdapter(view, name=name)
+        checker.defineChecker(
+            view, checker.NamesChecker(['browserDefault', '__call__']))
+    db = DB(MappingStorage(), pool_size=pool_size)
+    notify(zope.processlifetime.DatabaseOpened(db))
+    return zope.app.wsgi.WSGIPublisherApplication(db)
+
+
+class Server(ThreadingWSGIServer):
+    # Avoid connection retries by clients when many connect at once.
+    request_queue_size = 128
+
+
+class QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class AttemptCounter:
+    """Count the requests and publishing attempts, including retries."""
+
+    def __init__(self, application):
+        self.application = application
+        self.requests = 0
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.requests += 1
+        return self.application(environ, start_response)
+
+    def endRequest(self, event):
+        with self._lock:
+            self.attempts += 1
+
+
+def client(port, paths, write_ratio, deadline, latencies, errors):
+    path, write_path = paths
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            return
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        try:
+            connection.request(
+                'GET', write_path if random.random() < write_ratio else path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+        except OSError as e:
+            errors.append(e)
+        finally:
+            connection.close()
+        latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(application, clients, duration, path='/index.html',
+        write_path='/increment.html', write_ratio=0.0):
+    """Drive the application and return the results."""
+    counter = AttemptCounter(application)
+    component.provideHandler(counter.endRequest, (IEndRequestEvent,))
+    server = Server(('127.0.0.1', 0), QuietHandler)
+    server.set_app(counter)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client, args=(
+            port, (path, write_path), write_ratio, deadline, latencies,
+            errors))
+        for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    component.getGlobalSiteManager().unregisterHandler(
+        counter.endRequest, (IEndRequestEvent,))
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'clients': clients,
+        'duration': elapsed,
+        'requests': count,
+        'throughput': count / elapsed,
+        'p50': percentile(latencies, 0.5) if count else None,
+        'p95': percentile(latencies, 0.95) if count else None,
+        'p99': percentile(latencies, 0.99) if count else None,
+        'errors': len(errors),
+        'error_rate': len(errors) / count if count else 0.0,
+        'conflict_retries': counter.attempts - counter.requests,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-C', '--config', help='zope.conf to serve')
+    parser.add_argument('-c', '--clients', type=int, default=8,
+                        help='number of concurrent clients')
+    parser.add_argument('-d', '--duration', type=float, default=10.0,
+                        help='seconds to run')
+    parser.add_argument('--path', default='/index.html',
+                        help='path to request')
+    parser.add_argument('--write-path', default='/increment.html',
+                        help='path to request for writes')
+    parser.add_argument('--write-ratio', type=float, default=0.0,
+                        help='fraction of requests for --write-path')
+    parser.add_argument('--pool-size', type=int, default=7,
+                        help='connection pool size of the test application')
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    options = parser.parse_args(args)
+
+    # Conflicts are counted, there is no need to log each of them.
+    logging.disable(logging.WARNING)
+    if options.config:
+        application = zope.app.wsgi.getWSGIApplication(options.config)
+    else:
+        application = makeApplication(options.pool_size)
+    results = run(application, options.clients, options.duration,
+                  options.path, options.write_path, options.write_ratio)
+    if options.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+    print('%(requests)d requests by %(clients)d clients in %(duration).1fs'
+          % results)
+    print('throughput        %10.1f req/s' % results['throughput'])
+    if results['requests']:
+        for name in ('p50', 'p95', 'p99'):
+            print('%-17s %10.2f ms' % (name, results[name] * 1000))
+    print('errors            %10d (%.2f%%)' % (
+        results['errors'], results['error_rate'] * 100))
+    print('conflict retries  %10d' % results['conflict_retries'])
+
+
+if __name__ == '__main__':
+    main()
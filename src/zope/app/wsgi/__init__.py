@@ -14,6 +14,7 @@
 """A WSGI Application wrapper for zope
 """
 
+import io
 import logging
 import os
 import sys
@@ -29,6 +30,10 @@ from zope.publisher.interfaces.logginginfo import ILoggingInfo
 from zope.publisher.publish import publish
 
 from zope.app.wsgi import interfaces
+from zope.app.wsgi import routing
+from zope.app.wsgi import startup
+from zope.app.wsgi import timing
+from zope.app.wsgi import warmup
 
 
 @implementer(interfaces.IWSGIApplication)
@@ -38,12 +43,45 @@ class WSGIPublisherApplication:
     Instances of this class can be used as a WSGI application object.
 
     The class relies on a properly initialized request factory.
+
+    If ``timing`` is true, the time spent in each phase of handling a
+    request is reported in a ``Server-Timing`` response header, stored
+    in the ``zope.app.wsgi.timings`` environment key and announced by a
+    ``WSGIRequestTimed`` event.
+
+    If a ``watchdog`` (see ``zope.app.wsgi.watchdog``) is given, requests
+    are registered with it while they are published.
+
+    If a ``profiler`` (see ``zope.app.wsgi.profiling``) is given, requests
+    asking for it are published under the profiler.
+
+    If a ``readonly_db`` is given, requests for which ``readonly_rule``
+    (by default a ``zope.app.wsgi.routing.ReadOnlyRule``) returns true are
+    published using it, so they do not compete with writing requests for
+    connections.  Its storage must be read-only, so writes fail loudly.
     """
 
     def __init__(self, db=None, factory=HTTPPublicationRequestFactory,
-                 handle_errors=True):
+                 handle_errors=True, timing=False, watchdog=None,
+                 profiler=None, readonly_db=None, readonly_rule=None):
         self.requestFactory = None
+        self.readonlyRequestFactory = None
         self.handleErrors = handle_errors
+        self.db = db
+        self.readonly_db = readonly_db
+        self.timing = timing
+        self.watchdog = watchdog
+        self.profiler = profiler
+
+        if readonly_db is not None:
+            if not readonly_db.storage.isReadOnly():
+                raise ValueError(
+                    'The storage of the read-only database %r is writable.'
+                    % readonly_db.database_name)
+            self.readonlyRequestFactory = factory(readonly_db)
+            if readonly_rule is None:
+                readonly_rule = routing.ReadOnlyRule()
+        self.readonlyRule = readonly_rule
 
         if db is None:
             db = object()
@@ -51,12 +89,39 @@ class WSGIPublisherApplication:
 
     def __call__(self, environ, start_response):
         """See zope.app.wsgi.interfaces.IWSGIApplication"""
-        request = self.requestFactory(environ['wsgi.input'], environ)
+        timer = timing.PhaseTimer() if self.timing else timing.nullTimer
+        requestFactory = self.requestFactory
+        if (self.readonlyRequestFactory is not None and
+                self.readonlyRule(environ)):
+            requestFactory = self.readonlyRequestFactory
+        stream = environ['wsgi.input']
+        if (environ.get('CONTENT_LENGTH') in (None, '', '0') and
+                not environ.get('wsgi.input_terminated') and
+                'chunked' not in environ.get(
+                    'HTTP_TRANSFER_ENCODING', '').lower()):
+            # Retrying a request after a conflict reads the body until EOF,
+            # which never comes on a keep-alive socket.
+            stream = io.BytesIO()
+        request = requestFactory(stream, environ)
+        timer('factory')
 
         # Let's support post-mortem debugging
         handle_errors = environ.get('wsgi.handleErrors', self.handleErrors)
 
-        request = publish(request, handle_errors=handle_errors)
+        watchdog = self.watchdog
+        if watchdog is not None:
+            watchdog.enter(request, environ.get('PATH_INFO', ''))
+        try:
+            profiler = self.profiler
+            if profiler is not None and profiler.isRequested(environ):
+                request = profiler.runcall(
+                    environ, publish, request, handle_errors=handle_errors)
+            else:
+                request = publish(request, handle_errors=handle_errors)
+        finally:
+            if watchdog is not None:
+                watchdog.leave()
+        timer('publish')
         response = request.response
         # Get logging info from principal for log use
         logging_info = ILoggingInfo(request.principal, None)
@@ -70,9 +135,17 @@ class WSGIPublisherApplication:
         environ['wsgi.logging_info'] = message
         if 'REMOTE_USER' not in environ:
             environ['REMOTE_USER'] = message
+        timer('logging')
+
+        headers = response.getHeaders()
+        if self.timing:
+            environ['zope.app.wsgi.timings'] = timer.timings
+            headers.append(('Server-Timing', timer.getServerTiming()))
+            notify(interfaces.WSGIRequestTimed(
+                self, request, timer.timings))
 
         # Start the WSGI server response
-        start_response(response.getStatusString(), response.getHeaders())
+        start_response(response.getStatusString(), headers)
 
         # Return the result body iterable.
         return response.consumeBodyIter()
@@ -103,43 +176,63 @@ class PMDBWSGIPublisherApplication(WSGIPublisherApplication):
                 pass
 
 
-def config(configfile, schemafile=None, features=()):
+def loadOptions(configfile, schemafile=None, profile=startup.nullProfile):
+    """Load the configuration file and return the options it defines."""
     # Load the configuration schema
     if schemafile is None:
         schemafile = os.path.join(
             os.path.dirname(appsetup.__file__), 'schema', 'schema.xml')
 
     # Let's support both, an opened file and path
-    if isinstance(schemafile, (str, bytes)):
-        schema = ZConfig.loadSchema(schemafile)
-    else:
-        schema = ZConfig.loadSchemaFile(schemafile)
+    with profile.phase('schema'):
+        if isinstance(schemafile, (str, bytes)):
+            schema = ZConfig.loadSchema(schemafile)
+        else:
+            schema = ZConfig.loadSchemaFile(schemafile)
 
     # Load the configuration file
     # Let's support both, an opened file and path
     try:
-        if isinstance(configfile, (str, bytes)):
-            options, handlers = ZConfig.loadConfig(schema, configfile)
-        else:
-            options, handlers = ZConfig.loadConfigFile(schema, configfile)
+        with profile.phase('config'):
+            if isinstance(configfile, (str, bytes)):
+                options, handlers = ZConfig.loadConfig(schema, configfile)
+            else:
+                options, handlers = ZConfig.loadConfigFile(schema, configfile)
     except ZConfig.ConfigurationError as msg:
         sys.stderr.write("Error: %s\n" % str(msg))
         sys.exit(2)
+    return options
+
 
+def configure(options, features=(), profile=startup.nullProfile):
+    """Set up logging and execute the ZCML configuration.
+
+    This does not touch the database, so it can be done once before forking
+    worker processes which open the database themselves.
+
+    The result of executing the ZCML configuration is not cached between
+    process starts: directives create objects which cannot be persisted,
+    like local factories and dynamically created view classes, and have
+    side effects outside the component registry.  Use
+    ``zope.app.wsgi.prefork`` to pay the configuration cost only once for
+    all worker processes.
+    """
     # Insert all specified Python paths
     if options.path:
         sys.path[:0] = [os.path.abspath(p) for p in options.path]
 
     # Parse product configs
-    zope.app.appsetup.product.setProductConfigurations(
-        options.product_config)
+    with profile.phase('products'):
+        zope.app.appsetup.product.setProductConfigurations(
+            options.product_config)
 
-    # Setup the event log
-    options.eventlog()
+    with profile.phase('logging'):
+        # Setup the event log
+        options.eventlog()
 
-    # Setup other defined loggers
-    for logger in options.loggers:
-        logger()
+        # Setup other defined loggers
+        for logger in options.loggers:
+            logger()
 
     # Insert the devmode feature, if turned on
     if options.devmode:
@@ -152,22 +245,80 @@ def config(configfile, schemafile=None, features=()):
             "completely.")
 
     # Execute the ZCML configuration.
-    appsetup.config(options.site_definition, features=features)
+    with profile.profiledPhase('zcml'):
+        appsetup.config(options.site_definition, features=features)
 
+
+def openDatabase(options, profile=startup.nullProfile, warmup_file=None):
+    """Open the configured database and notify subscribers.
+
+    If ``warmup_file`` is given, the caches of the database connections
+    are warmed up in the background from the objects saved to it, see
+    ``zope.app.wsgi.warmup``.
+    """
     # Connect to and open the database, notify subscribers.
-    db = appsetup.multi_database(options.databases)[0][0]
-    notify(zope.processlifetime.DatabaseOpened(db))
+    with profile.phase('database'):
+        db = appsetup.multi_database(options.databases)[0][0]
+    with profile.phase('database-opened'):
+        notify(zope.processlifetime.DatabaseOpened(db))
+    if warmup_file:
+        with profile.phase('cache-warmup'):
+            warmup.CacheWarmer(db, warmup_file).start()
 
     return db
 
 
+def config(configfile, schemafile=None, features=(),
+           profile=startup.nullProfile, warmup_file=None):
+    options = loadOptions(configfile, schemafile, profile)
+    configure(options, features, profile)
+    return openDatabase(options, profile, warmup_file)
+
+
 def getWSGIApplication(configfile, schemafile=None, features=(),
                        requestFactory=HTTPPublicationRequestFactory,
-                       handle_errors=True):
-    db = config(configfile, schemafile, features)
-    application = WSGIPublisherApplication(db, requestFactory, handle_errors)
+                       handle_errors=True, timing=False,
+                       startup_profile=None, readonly_database=None,
+                       readonly_rule=None, warmup_file=None):
+    """Configure the application and return it.
+
+    If ``startup_profile`` or the ``ZOPE_APP_WSGI_STARTUP_PROFILE``
+    environment variable are set, a report about the time spent in each
+    phase of the startup is written to the file they name.
+
+    ``readonly_database`` is the name of a database in the configuration
+    used for read-only requests, see ``WSGIPublisherApplication``.
+
+    ``warmup_file`` names a file the objects in the connection caches are
+    saved to, to warm up the caches from it at the next start.
+    """
+    if startup_profile is None:
+        startup_profile = os.environ.get(startup.ENVIRONMENT_VARIABLE)
+    if startup_profile:
+        profile = startup.StartupProfile()
+    else:
+        profile = startup.nullProfile
+
+    db = config(configfile, schemafile, features, profile, warmup_file)
+    with profile.phase('application'):
+        readonly_db = None
+        if readonly_database is not None:
+            # All configured databases are available from the first one.
+            try:
+                readonly_db = db.databases[readonly_database]
+            except KeyError:
+                for database in db.databases.values():
+                    database.close()
+                raise ValueError(
+                    'There is no database named %r.' % readonly_database)
+        application = WSGIPublisherApplication(
+            db, requestFactory, handle_errors, timing=timing,
+            readonly_db=readonly_db, readonly_rule=readonly_rule)
 
     # Create the application, notify subscribers.
-    notify(interfaces.WSGIPublisherApplicationCreated(application))
+    with profile.phase('application-created'):
+        notify(interfaces.WSGIPublisherApplicationCreated(application))
 
+    if startup_profile:
+        profile.write(startup_profile)
     return application
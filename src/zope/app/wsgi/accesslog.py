@@ -0,0 +1,214 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""WSGI middleware writing a structured access log.
+
+Each request is logged as a line of JSON.  The records are written by a
+background thread, so request threads never wait for disk I/O.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AccessLogWriter:
+    """Write access log records to a stream in a background thread.
+
+    Records are handed over through a queue holding at most ``max_queued``
+    records.  If it is full, records are dropped and counted in
+    ``dropped``, as are records which cannot be written.  Up to
+    ``batch_size`` records are written at once.
+    """
+
+    def __init__(self, stream, max_queued=10000, batch_size=100):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.queue = queue.Queue(max_queued)
+        self.dropped = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._failing = False
+
+    def put(self, record):
+        if self._thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='zope.app.wsgi.accesslog',
+                    daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Write the queued records and stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # Let a later call try again.
+            with self._lock:
+                if self._thread is None:
+                    self._thread = thread
+            return
+        thread.join(timeout)
+
+    def _run(self):
+        get = self.queue.get
+        get_nowait = self.queue.get_nowait
+        while True:
+            batch = [get()]
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    batch.append(get_nowait())
+            except queue.Empty:
+                pass
+            stop = batch[-1] is _STOP
+            if stop:
+                del batch[-1]
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    with self._lock:
+                        self.dropped += len(batch)
+                    # Log once until writing works again.
+                    if not self._failing:
+                        logger.exception('Cannot write the access log.')
+                    self._failing = True
+                else:
+                    self._failing = False
+            if stop:
+                return
+
+    def _write(self, batch):
+        self.stream.write(''.join(
+            json.dumps(record, separators=(',', ':')) + '\n'
+            for record in batch))
+        self.stream.flush()
+        self.written += len(batch)
+
+
+class AccessLogMiddleware:
+    """Log the requests handled by an application to a stream.
+
+    A record holds the start time, client address, method, path, status,
+    number of bytes sent, latency in seconds and the principal as set by
+    ``WSGIPublisherApplication`` in ``wsgi.logging_info``.  It is written
+    when the response body has been closed.  Results of
+    ``wsgi.file_wrapper`` are passed to the server unchanged, so it can
+    send the file efficiently: their record is written right away, with
+    the bytes taken from the ``Content-Length``.
+
+    The remaining arguments are passed to ``AccessLogWriter``, which is
+    available as ``writer``.
+    """
+
+    def __init__(self, application, stream, max_queued=10000,
+                 batch_size=100):
+        self.application = application
+        self.writer = AccessLogWriter(stream, max_queued, batch_size)
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        record = {
+            'time': time.time(),
+            'remote_addr': environ.get('REMOTE_ADDR'),
+            'method': environ.get('REQUEST_METHOD'),
+            'path': environ.get('PATH_INFO', ''),
+            'query': environ.get('QUERY_STRING', ''),
+            'status': 500,
+            'bytes': 0,
+        }
+
+        length = None
+
+        def log_start_response(status, headers, exc_info=None):
+            nonlocal length
+            record['status'] = int(status.split(' ', 1)[0])
+            for name, value in headers:
+                if name.lower() == 'content-length':
+                    length = value
+            return start_response(status, headers, exc_info)
+
+        try:
+            result = self.application(environ, log_start_response)
+        except BaseException:
+            self._finished(environ, record, start)
+            raise
+
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(file_wrapper, type) and isinstance(result, file_wrapper):
+            # Wrapping the result would prevent the server from sending the
+            # file efficiently, so rely on the announced length instead.
+            if length and length.isdigit():
+                record['bytes'] = int(length)
+            self._finished(environ, record, start)
+            return result
+        return LoggingIterator(self, result, environ, record, start)
+
+    def _finished(self, environ, record, start):
+        record['duration'] = time.perf_counter() - start
+        record['principal'] = environ.get(
+            'wsgi.logging_info', environ.get('REMOTE_USER'))
+        self.writer.put(record)
+
+
+class LoggingIterator:
+    """Iterate over a response body, counting the bytes sent.
+
+    The record is logged when the body is closed.
+    """
+
+    def __init__(self, middleware, result, environ, record, start):
+        self._middleware = middleware
+        self._result = result
+        self._environ = environ
+        self._record = record
+        self._start = start
+        self._closed = False
+
+    def __iter__(self):
+        record = self._record
+        for chunk in self._result:
+            record['bytes'] += len(chunk)
+            yield chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._result, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._middleware._finished(
+                self._environ, self._record, self._start)
@@ -0,0 +1,92 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""WSGI middleware limiting the number of concurrently published requests.
+
+Under overload it is better to turn requests away quickly than to let
+them all wait for a database connection, which makes every request slow.
+"""
+import threading
+
+
+class AdmissionControlMiddleware:
+    """Cap the number of requests handled by the application at once.
+
+    At most ``max_concurrent`` requests are passed to the application at
+    the same time; by default this is the connection pool size of the
+    database, taken from the application if not given.  Up to ``max_queued``
+    further requests wait at most ``timeout`` seconds for their turn.  All
+    other requests are answered with ``503 Service Unavailable`` and a
+    ``Retry-After`` header at once.
+
+    Requests for paths starting with one of ``priority_paths``, like health
+    checks or administrative pages, are always let through.
+
+    The application is considered busy with a request until it returns the
+    response body, which is the case for ``WSGIPublisherApplication`` once
+    it has published the request.
+    """
+
+    def __init__(self, application, db=None, max_concurrent=None,
+                 max_queued=None, timeout=5.0, retry_after=1,
+                 priority_paths=()):
+        self.application = application
+        if max_concurrent is None:
+            if db is None:
+                db = getattr(application, 'db', None)
+            if db is None:
+                raise ValueError(
+                    'Either max_concurrent or a database is needed.')
+            max_concurrent = db.getPoolSize()
+        self.max_concurrent = max_concurrent
+        if max_queued is None:
+            max_queued = max_concurrent
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.priority_paths = tuple(priority_paths)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.rejected = 0
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.priority_paths):
+            return self.application(environ, start_response)
+        if not self._acquire():
+            with self._lock:
+                self.rejected += 1
+            body = b'The server is overloaded, please retry later.'
+            start_response('503 Service Unavailable', [
+                ('Content-Type', 'text/plain'),
+                ('Content-Length', str(len(body))),
+                ('Retry-After', str(self.retry_after)),
+            ])
+            return [body]
+        try:
+            return self.application(environ, start_response)
+        finally:
+            self._slots.release()
+
+    def _acquire(self):
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self.waiting >= self.max_queued:
+                return False
+            self.waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
@@ -0,0 +1,234 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""An ASGI application wrapper for the WSGI publisher application.
+
+The wrapped application is called in a bounded thread pool, so the event
+loop of the ASGI server is never blocked by publishing.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import sys
+
+
+# The default pool size of ZODB.DB, used if the application has no database.
+DEFAULT_MAX_WORKERS = 7
+
+_DONE = object()
+
+
+class InputStream:
+    """A ``wsgi.input`` stream fed by the ASGI ``receive`` callable.
+
+    The stream is read from a worker thread; each time more data is
+    needed the next message is received on the event loop.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._more = True
+
+    def _fill(self):
+        message = asyncio.run_coroutine_threadsafe(
+            self._receive(), self._loop).result()
+        if message['type'] == 'http.disconnect':
+            self._more = False
+            raise OSError('The client disconnected.')
+        self._buffer += message.get('body', b'')
+        self._more = message.get('more_body', False)
+
+    def _take(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+        while self._more and (size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size < 0:
+            size = len(self._buffer)
+        return self._take(size)
+
+    def readline(self, size=-1):
+        if size is None:
+            size = -1
+        while (self._more and b'\n' not in self._buffer and
+               (size < 0 or len(self._buffer) < size)):
+            self._fill()
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        if size >= 0:
+            end = min(end, size)
+        return self._take(end)
+
+    def readlines(self, hint=-1):
+        lines = []
+        total = 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if 0 < hint <= total:
+                break
+        return lines
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+
+def getEnviron(scope, input_stream):
+    """Build a WSGI environment from an ASGI HTTP connection scope."""
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': input_stream,
+        # ``InputStream`` returns EOF at the end of the body.
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+    return environ
+
+
+def getMaxWorkers(application):
+    """Return the number of worker threads for an application.
+
+    This is the size of the connection pool of the application's database,
+    as more concurrent requests would only wait for a connection.
+    """
+    db = getattr(application, 'db', None)
+    if db is None:
+        return DEFAULT_MAX_WORKERS
+    return db.getPoolSize()
+
+
+class ASGIApplication:
+    """An ASGI application calling a WSGI application in a thread pool.
+
+    The thread pool is sized from the database of the WSGI application,
+    unless ``max_workers`` or an ``executor`` are given.
+    """
+
+    def __init__(self, application, max_workers=None, executor=None):
+        self.application = application
+        if executor is None:
+            if max_workers is None:
+                max_workers = getMaxWorkers(application)
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers, thread_name_prefix='zope.app.wsgi.asgi')
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError('Unsupported scope type: %s' % scope['type'])
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        run = functools.partial(loop.run_in_executor, self.executor)
+        environ = getEnviron(scope, InputStream(receive, loop))
+        response = {}
+        # Data passed to the ``write`` callable returned by
+        # ``start_response``, sent before the next chunk of the body.
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers]
+            return written.append
+
+        async def start():
+            if not response.get('started'):
+                if 'status' not in response:
+                    raise RuntimeError(
+                        'The application did not call start_response.')
+                response['started'] = True
+                await send({'type': 'http.response.start',
+                            'status': response['status'],
+                            'headers': response['headers']})
+
+        async def sendBody(chunk):
+            body = b''.join(written) + chunk
+            del written[:]
+            if body:
+                await start()
+                await send({'type': 'http.response.body',
+                            'body': body, 'more_body': True})
+
+        app_iter = await run(self.application, environ, start_response)
+        try:
+            iterator = iter(app_iter)
+            while True:
+                # The first chunk may trigger start_response, so it has to
+                # be fetched before the response is started.
+                chunk = await run(next, iterator, _DONE)
+                if chunk is _DONE:
+                    break
+                await sendBody(chunk)
+            await sendBody(b'')
+            await start()
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                await run(close)
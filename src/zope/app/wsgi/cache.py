@@ -0,0 +1,212 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""WSGI middleware caching whole responses.
+
+Cached responses are only valid as long as the database did not change:
+the cache remembers the last transaction id of the database when a
+response was rendered and drops all entries as soon as it sees a newer
+one.  As it is not known which objects a page depends on, every commit
+invalidates the whole cache.
+"""
+import collections
+import threading
+
+
+class CacheEntry:
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.size = len(body) + sum(
+            len(name) + len(value) for name, value in headers)
+
+
+class ResponseCacheMiddleware:
+    """Cache responses to anonymous ``GET`` requests.
+
+    The cache key consists of the URL and the values of the request headers
+    listed in ``vary`` (as WSGI environment keys).  Requests having any of
+    the ``bypass`` keys, like credentials or cookies, are never cached.
+
+    Only ``200`` responses without ``Set-Cookie`` header, which are not
+    marked ``private``, ``no-store`` or ``no-cache``, do not ``Vary`` on
+    headers missing in ``vary`` and are not larger than ``max_entry_size``
+    are stored.  The least recently used entries are
+    evicted when the cache grows beyond ``max_size`` bytes.
+
+    The database is taken from the application if not given.
+    """
+
+    def __init__(self, application, db=None, max_size=64 * 1024 * 1024,
+                 max_entry_size=1024 * 1024,
+                 vary=('HTTP_ACCEPT_ENCODING', 'HTTP_ACCEPT_LANGUAGE'),
+                 bypass=('HTTP_AUTHORIZATION', 'HTTP_COOKIE')):
+        self.application = application
+        if db is None:
+            db = getattr(application, 'db', None)
+        if db is None:
+            raise ValueError('The response cache needs a database.')
+        self.db = db
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self.vary = tuple(vary)
+        self.bypass = tuple(bypass)
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._tid = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self):
+        """Return statistics about the cache."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def __call__(self, environ, start_response):
+        if (environ.get('REQUEST_METHOD', 'GET') != 'GET' or
+                any(environ.get(name) for name in self.bypass)):
+            return self.application(environ, start_response)
+
+        key = self._getKey(environ)
+        tid = self.db.lastTransaction()
+        entry = self._lookup(key, tid)
+        if entry is not None:
+            start_response(entry.status, list(entry.headers))
+            return [entry.body]
+
+        response = {}
+
+        def cache_start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = list(headers)
+            return start_response(status, headers, exc_info)
+
+        result = self.application(environ, cache_start_response)
+        if response and not self._isStorable(response):
+            return result
+        return CachingIterator(self, key, tid, result, response)
+
+    def _getKey(self, environ):
+        return (
+            environ.get('wsgi.url_scheme'),
+            environ.get('HTTP_HOST') or environ.get('SERVER_NAME'),
+            environ.get('SCRIPT_NAME', ''),
+            environ.get('PATH_INFO', ''),
+            environ.get('QUERY_STRING', ''),
+        ) + tuple(environ.get(name) for name in self.vary)
+
+    def _invalidate(self, tid):
+        # Must be called with the lock held.
+        if tid != self._tid:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+                self.size = 0
+            self._tid = tid
+
+    def _lookup(self, key, tid):
+        with self._lock:
+            self._invalidate(tid)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return entry
+
+    def _isStorable(self, response):
+        if not response['status'].startswith('200'):
+            return False
+        for name, value in response['headers']:
+            name = name.lower()
+            if name == 'set-cookie':
+                return False
+            if name == 'cache-control' and any(
+                    directive in value.lower()
+                    for directive in ('private', 'no-store', 'no-cache')):
+                return False
+            if name == 'vary' and any(
+                    'HTTP_' + header.strip().upper().replace('-', '_')
+                    not in self.vary for header in value.split(',')):
+                return False
+            if (name == 'content-length' and value.isdigit() and
+                    int(value) > self.max_entry_size):
+                return False
+        return True
+
+    def _store(self, key, tid, response, body):
+        entry = CacheEntry(response['status'], response['headers'], body)
+        if entry.size > self.max_size:
+            return
+        with self._lock:
+            # Do not store the response if the database changed while it
+            # was rendered, e.g. by the request itself.
+            if self.db.lastTransaction() != tid:
+                return
+            self._invalidate(tid)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_size:
+                evicted = self._entries.popitem(last=False)[1]
+                self.size -= evicted.size
+                self.evictions += 1
+
+
+class CachingIterator:
+    """Send a response body and store it in the cache once complete."""
+
+    def __init__(self, cache, key, tid, result, response):
+        self._cache = cache
+        self._key = key
+        self._tid = tid
+        self._result = result
+        self._response = response
+
+    def __iter__(self):
+        chunks = []
+        size = 0
+        storable = True
+        for chunk in self._result:
+            if storable:
+                size += len(chunk)
+                storable = size <= self._cache.max_entry_size
+                if storable:
+                    chunks.append(chunk)
+                else:
+                    chunks = []
+            yield chunk
+        if (storable and self._response and
+                self._cache._isStorable(self._response)):
+            self._cache._store(
+                self._key, self._tid, self._response, b''.join(chunks))
+
+    def close(self):
+        close = getattr(self._result, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,174 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""WSGI middleware compressing response bodies.
+
+The body is compressed incrementally while it is sent, so it is never
+buffered as a whole.
+"""
+import zlib
+
+
+# Content types worth compressing; a trailing slash matches a major type.
+DEFAULT_CONTENT_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'application/xhtml+xml',
+    'image/svg+xml',
+)
+
+# The ``wbits`` argument of zlib for each supported content coding.
+_WBITS = {
+    'gzip': 31,
+    'deflate': 15,
+}
+
+
+def chooseEncoding(accept_encoding):
+    """Return the preferred supported content coding, or None.
+
+    ``gzip`` is preferred over ``deflate`` if the client accepts both.
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in ('gzip', 'deflate'):
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+
+def _addVary(headers, value):
+    for i, (name, old) in enumerate(headers):
+        if name.lower() == 'vary':
+            if value.lower() not in [v.strip().lower()
+                                     for v in old.split(',')]:
+                headers[i] = (name, '%s, %s' % (old, value))
+            return
+    headers.append(('Vary', value))
+
+
+class CompressionMiddleware:
+    """Compress response bodies with gzip or deflate.
+
+    A body is compressed if the client accepts it, the content type
+    matches one of ``content_types`` and the ``Content-Length`` is not
+    below ``minimum_size``.  Bodies without a ``Content-Length`` are
+    compressed regardless of their size.  Responses which already have a
+    ``Content-Encoding``, like compressed files, and partial content are
+    never compressed.
+    """
+
+    def __init__(self, application, minimum_size=1024,
+                 content_types=DEFAULT_CONTENT_TYPES, level=6):
+        self.application = application
+        self.minimum_size = minimum_size
+        self.content_types = tuple(content_types)
+        self.level = level
+
+    def _isCompressible(self, content_type):
+        content_type = content_type.split(';', 1)[0].strip().lower()
+        return any(
+            content_type.startswith(allowed) if allowed.endswith('/')
+            else content_type == allowed
+            for allowed in self.content_types)
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = chooseEncoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        state = {'encoding': None, 'started': False}
+
+        def compression_start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            state['encoding'] = self._start(encoding, status, headers)
+            state['started'] = True
+            return start_response(status, headers, exc_info)
+
+        result = self.application(environ, compression_start_response)
+        if state['started'] and state['encoding'] is None:
+            return result
+        return CompressingIterator(result, state, self.level)
+
+    def _start(self, encoding, status, headers):
+        """Adjust the headers and return the coding to use, if any."""
+        found = {name.lower(): value for name, value in headers}
+        if (status[:3] in ('204', '206', '304') or
+                'content-encoding' in found or
+                not self._isCompressible(found.get('content-type', ''))):
+            return None
+        _addVary(headers, 'Accept-Encoding')
+        length = found.get('content-length')
+        if (encoding is None or
+                (length and length.isdigit() and
+                 int(length) < self.minimum_size)):
+            return None
+
+        for i, (name, value) in reversed(list(enumerate(headers))):
+            name = name.lower()
+            if name in ('content-length', 'accept-ranges'):
+                del headers[i]
+            elif name == 'etag' and not value.startswith('W/'):
+                # The compressed body is not byte-for-byte the same.
+                headers[i] = ('ETag', 'W/' + value)
+        headers.append(('Content-Encoding', encoding))
+        return encoding
+
+
+class CompressingIterator:
+    """Compress the chunks of a response body as they are sent."""
+
+    def __init__(self, result, state, level):
+        self._result = result
+        self._state = state
+        self._level = level
+
+    def _compressor(self):
+        encoding = self._state['encoding']
+        if encoding is None:
+            return None
+        return zlib.compressobj(self._level, zlib.DEFLATED, _WBITS[encoding])
+
+    def __iter__(self):
+        compressor = None
+        for chunk in self._result:
+            if compressor is None:
+                # start_response may only be called when the first chunk is
+                # produced, so the coding is not known before.
+                compressor = self._compressor()
+                if compressor is None:
+                    yield chunk
+                    continue
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        if compressor is None:
+            compressor = self._compressor()
+        if compressor is not None:
+            yield compressor.flush()
+
+    def close(self):
+        close = getattr(self._result, 'close', None)
+        if close is not None:
+            close()
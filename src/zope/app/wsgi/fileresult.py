@@ -12,7 +12,11 @@
 #
 ##############################################################################
 """IResult adapters for files."""
+import collections
+import email.utils
 import io
+import os
+import re
 import tempfile
 
 import zope.publisher.http
@@ -24,32 +28,263 @@ from zope import component
 from zope import interface
 
 
+_byte_range_re = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+# Requests asking for more ranges than this are served the whole file.
+MAX_RANGES = 16
+
+
 @interface.implementer(IResult)
 class FallbackWrapper:
+    """Iterate over a file if the server provides no ``wsgi.file_wrapper``.
+
+    The file is read in chunks of ``chunk_size`` bytes, which can be
+    changed for all wrappers by setting the class attribute or for a
+    single one by passing it to the constructor.
+    """
+
+    chunk_size = 32768
 
-    def __init__(self, f):
+    def __init__(self, f, chunk_size=None):
         self.close = f.close
         self._file = f
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
 
     def __iter__(self):
-        f = self._file
+        read = self._file.read
+        chunk_size = self.chunk_size
         while True:
-            v = f.read(32768)
+            v = read(chunk_size)
             if v:
                 yield v
             else:
                 break
 
 
+class RangeFile:
+    """A read-only file giving access to parts of another file.
+
+    ``parts`` is a sequence of byte strings, which are returned verbatim,
+    and ``(offset, length)`` tuples, which are read from the file.
+    """
+
+    def __init__(self, f, parts):
+        self._file = f
+        self._parts = collections.deque(parts)
+
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and size:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                data = part if size < 0 else part[:size]
+                rest = part[len(data):]
+            else:
+                offset, length = part
+                self._file.seek(offset)
+                data = self._file.read(length if size < 0
+                                       else min(size, length))
+                if data and len(data) < length:
+                    rest = (offset + len(data), length - len(data))
+                else:
+                    # Done, or the file was truncated underneath us.
+                    rest = None
+            if rest:
+                self._parts[0] = rest
+            else:
+                self._parts.popleft()
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b''.join(chunks)
+
+    def close(self):
+        self._file.close()
+
+
+def parseRange(header, size):
+    """Parse the value of a ``Range`` header for a file of ``size`` bytes.
+
+    Return a list of ``(start, stop)`` tuples for the satisfiable ranges,
+    where ``stop`` is exclusive.  An empty list means that none of the
+    ranges can be satisfied.  Return None if the header is invalid or not
+    about bytes, in which case it has to be ignored.
+    """
+    unit, sep, specs = header.partition('=')
+    if not sep or unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        match = _byte_range_re.match(spec)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            if last:
+                stop = int(last) + 1
+                if stop <= start:
+                    return None
+                stop = min(stop, size)
+            else:
+                stop = size
+        elif last:
+            # A suffix range: the last N bytes.
+            start = max(size - int(last), 0)
+            stop = size
+        else:
+            return None
+        if start < stop:
+            ranges.append((start, stop))
+    return ranges
+
+
+def _setValidators(f, response, size):
+    """Set ``ETag`` and ``Last-Modified`` headers from the file's status.
+
+    Headers already set by the application are left alone.  Nothing is set
+    for files which have no file descriptor, like ``io.BytesIO``.
+    """
+    try:
+        st = os.fstat(f.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return
+    if response.getHeader('ETag') is None:
+        response.setHeader(
+            'ETag', '"%x-%x-%x"' % (st.st_ino, size, st.st_mtime_ns))
+    if response.getHeader('Last-Modified') is None:
+        response.setHeader(
+            'Last-Modified', email.utils.formatdate(st.st_mtime, usegmt=True))
+
+
+def _parseDate(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def isNotModified(request):
+    """Tell whether the response validators match the conditional headers.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+    """
+    response = request.response
+    if_none_match = request.getHeader('If-None-Match')
+    if if_none_match:
+        etag = response.getHeader('ETag')
+        if etag is None:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        # Use the weak comparison function.
+        etag = etag.removeprefix('W/')
+        return any(tag.strip().removeprefix('W/') == etag
+                   for tag in if_none_match.split(','))
+    if_modified_since = request.getHeader('If-Modified-Since')
+    last_modified = response.getHeader('Last-Modified')
+    if if_modified_since and last_modified:
+        since = _parseDate(if_modified_since)
+        modified = _parseDate(last_modified)
+        return (since is not None and modified is not None and
+                modified <= since)
+    return False
+
+
+def _ifRangeMatches(request):
+    if_range = request.getHeader('If-Range')
+    if not if_range:
+        return True
+    response = request.response
+    if if_range.startswith(('"', 'W/"')):
+        # Only strong validators may be used with If-Range.
+        etag = response.getHeader('ETag')
+        return (etag is not None and not etag.startswith('W/') and
+                etag == if_range)
+    last_modified = response.getHeader('Last-Modified')
+    return last_modified is not None and last_modified == if_range
+
+
+def _rangeResult(f, request, size):
+    """Set up the response for a Range request.
+
+    Return None if the whole file should be served, or a file-like object
+    providing the requested ranges otherwise.
+    """
+    response = request.response
+    header = request.getHeader('Range')
+    # A status of 599 means that none has been set yet, so it will be 200.
+    if (not header or request.method not in ('GET', 'HEAD') or
+            response.getStatus() not in (200, 599) or
+            not _ifRangeMatches(request)):
+        return None
+    ranges = parseRange(header, size)
+    if ranges is None or len(ranges) > MAX_RANGES:
+        return None
+
+    if not ranges:
+        response.setStatus(416)
+        response.setHeader('Content-Range', 'bytes */%d' % size)
+        response.setHeader('Content-Length', '0')
+        return RangeFile(f, ())
+
+    response.setStatus(206)
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        response.setHeader('Content-Range',
+                           'bytes %d-%d/%d' % (start, stop - 1, size))
+        response.setHeader('Content-Length', str(stop - start))
+        return RangeFile(f, [(start, stop - start)])
+
+    boundary = os.urandom(16).hex()
+    content_type = response.getHeader('Content-Type')
+    parts = []
+    length = 0
+    for start, stop in ranges:
+        head = '\r\n--%s\r\n' % boundary
+        if content_type:
+            head += 'Content-Type: %s\r\n' % content_type
+        head += 'Content-Range: bytes %d-%d/%d\r\n\r\n' % (
+            start, stop - 1, size)
+        head = head.encode('latin-1')
+        parts += [head, (start, stop - start)]
+        length += len(head) + stop - start
+    tail = ('\r\n--%s--\r\n' % boundary).encode('latin-1')
+    parts.append(tail)
+    length += len(tail)
+    response.setHeader('Content-Type',
+                       'multipart/byteranges; boundary=%s' % boundary)
+    response.setHeader('Content-Length', str(length))
+    return RangeFile(f, parts)
+
+
 @component.adapter(io._io._IOBase, zope.publisher.interfaces.http.IHTTPRequest)
 @interface.implementer(zope.publisher.http.IResult)
 def FileResult(f, request):
     f = removeSecurityProxy(f)
-    if request.response.getHeader('content-length') is None:
+    response = request.response
+    if response.getHeader('content-length') is None:
         f.seek(0, 2)
         size = f.tell()
         f.seek(0)
-        request.response.setHeader('Content-Length', str(size))
+        if isinstance(f, io.TextIOBase):
+            response.setHeader('Content-Length', str(size))
+        else:
+            _setValidators(f, response, size)
+            # A status of 599 means that none has been set yet.
+            if (request.method in ('GET', 'HEAD') and
+                    response.getStatus() in (200, 599) and
+                    isNotModified(request)):
+                response.setStatus(304)
+                f = RangeFile(f, ())
+            else:
+                response.setHeader('Content-Length', str(size))
+                # Byte offsets can only be used on binary files.
+                response.setHeader('Accept-Ranges', 'bytes')
+                partial = _rangeResult(f, request, size)
+                if partial is not None:
+                    f = partial
 
     wrapper = request.environment.get('wsgi.file_wrapper')
     if wrapper is not None:
@@ -86,3 +86,28 @@ class WSGIPublisherApplicationCreated:
 
     def __init__(self, application):
         self.application = application
+
+
+class IWSGIRequestTimedEvent(zope.interface.Interface):
+    """A request has been handled by a WSGI application with timing enabled.
+
+    Subscribe to this event to feed the timings into other telemetry.
+    """
+
+    application = zope.interface.Attribute("The WSGI application.")
+
+    request = zope.interface.Attribute("The published request.")
+
+    timings = zope.interface.Attribute(
+        "A dictionary mapping the names of the phases of handling the "
+        "request (``factory``, ``publish`` and ``logging``) to the time "
+        "spent in them in seconds.")
+
+
+@zope.interface.implementer(IWSGIRequestTimedEvent)
+class WSGIRequestTimed:
+
+    def __init__(self, application, request, timings):
+        self.application = application
+        self.request = request
+        self.timings = timings
@@ -0,0 +1,201 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""WSGI middleware collecting request metrics.
+
+The metrics are rendered in the Prometheus text exposition format.
+"""
+import bisect
+import collections
+import threading
+import time
+
+
+# Upper bounds of the latency histogram buckets in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsMiddleware:
+    """Collect metrics about the requests handled by an application.
+
+    Collected are the number of requests by status, a latency histogram,
+    the number of requests in flight and the number of bytes sent.  The
+    latency of a request ends when its response body has been closed.
+
+    If a database is given, or the application has one (like
+    ``WSGIPublisherApplication``), its connection pool and cache are
+    reported too.
+
+    If ``path`` is given, e.g. ``/metrics``, requests for it are answered
+    with the metrics without calling the application.  The endpoint is not
+    protected, so only enable it if the path cannot be reached from
+    outside.  Otherwise ``render()`` can be used to publish the metrics.
+    """
+
+    def __init__(self, application, db=None, path=None,
+                 buckets=DEFAULT_BUCKETS):
+        self.application = application
+        if db is None:
+            db = getattr(application, 'db', None)
+        self.db = db
+        self.path = path
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.latency_sum = 0.0
+        self.in_flight = 0
+        self.response_bytes = 0
+
+    def __call__(self, environ, start_response):
+        if self.path is not None and environ.get('PATH_INFO') == self.path:
+            body = self.render().encode('utf-8')
+            start_response('200 OK', [('Content-Type', CONTENT_TYPE),
+                                      ('Content-Length', str(len(body)))])
+            return [body]
+
+        start = time.perf_counter()
+        response = {'status': '500', 'length': None}
+
+        def metrics_start_response(status, headers, exc_info=None):
+            response['status'] = status.split(' ', 1)[0]
+            for name, value in headers:
+                if name.lower() == 'content-length':
+                    response['length'] = value
+            return start_response(status, headers, exc_info)
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            result = self.application(environ, metrics_start_response)
+        except BaseException:
+            self._finished(start, response['status'], 0)
+            raise
+
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(file_wrapper, type) and isinstance(result, file_wrapper):
+            # Wrapping the result would prevent the server from sending the
+            # file efficiently, so rely on the announced length instead.
+            length = response['length']
+            self._finished(start, response['status'],
+                           int(length) if length and length.isdigit() else 0)
+            return result
+        return ResponseIterator(self, result, start, response)
+
+    def _finished(self, start, status, length):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[status] += 1
+            self.bucket_counts[bisect.bisect_left(self.buckets, elapsed)] += 1
+            self.latency_sum += elapsed
+            self.response_bytes += length
+
+    def render(self):
+        """Return the metrics in the Prometheus text format."""
+        with self._lock:
+            requests = sorted(self.requests.items())
+            bucket_counts = list(self.bucket_counts)
+            latency_sum = self.latency_sum
+            in_flight = self.in_flight
+            response_bytes = self.response_bytes
+
+        lines = [
+            '# HELP zope_wsgi_requests_total Requests handled by status.',
+            '# TYPE zope_wsgi_requests_total counter',
+        ]
+        lines += ['zope_wsgi_requests_total{status="%s"} %d' % item
+                  for item in requests]
+
+        lines += [
+            '# HELP zope_wsgi_request_duration_seconds Request latency.',
+            '# TYPE zope_wsgi_request_duration_seconds histogram',
+        ]
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), bucket_counts):
+            total += count
+            lines.append(
+                'zope_wsgi_request_duration_seconds_bucket{le="%s"} %d' % (
+                    bound, total))
+        lines += [
+            'zope_wsgi_request_duration_seconds_sum %r' % latency_sum,
+            'zope_wsgi_request_duration_seconds_count %d' % total,
+            '# HELP zope_wsgi_requests_in_flight Requests being handled.',
+            '# TYPE zope_wsgi_requests_in_flight gauge',
+            'zope_wsgi_requests_in_flight %d' % in_flight,
+            '# HELP zope_wsgi_response_bytes_total Response body bytes sent.',
+            '# TYPE zope_wsgi_response_bytes_total counter',
+            'zope_wsgi_response_bytes_total %d' % response_bytes,
+        ]
+        if self.db is not None:
+            lines += self._renderDatabase()
+        return '\n'.join(lines) + '\n'
+
+    def _renderDatabase(self):
+        db = self.db
+        pool = db.pool
+        gauges = [
+            ('zodb_pool_size', 'Target size of the connection pool.',
+             db.getPoolSize()),
+            ('zodb_connections', 'Connections opened from the pool.',
+             len(pool.all)),
+            ('zodb_connections_available', 'Idle connections in the pool.',
+             len(pool.available)),
+            ('zodb_cache_size', 'Target number of objects per cache.',
+             db.getCacheSize()),
+            ('zodb_cache_objects', 'Objects in all connection caches.',
+             db.cacheSize()),
+        ]
+        lines = []
+        for name, description, value in gauges:
+            lines += [
+                '# HELP %s %s' % (name, description),
+                '# TYPE %s gauge' % name,
+                '%s{database="%s"} %d' % (name, db.database_name, value),
+            ]
+        return lines
+
+
+class ResponseIterator:
+    """Iterate over a response body, counting the bytes sent.
+
+    The request is recorded as finished when the body is closed.
+    """
+
+    def __init__(self, middleware, result, start, response):
+        self._middleware = middleware
+        self._result = result
+        self._start = start
+        self._response = response
+        self._length = 0
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._result:
+            self._length += len(chunk)
+            yield chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._result, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._middleware._finished(
+                self._start, self._response['status'], self._length)
@@ -16,6 +16,7 @@ import zope.event
 import zope.processlifetime
 
 from zope.app.wsgi import getWSGIApplication
+from zope.app.wsgi.routing import ReadOnlyRule
 
 
 def asbool(obj):
@@ -28,8 +29,20 @@ def asbool(obj):
     return bool(obj)
 
 
-def ZopeApplication(global_config, config_file, handle_errors=True, **options):
+def ZopeApplication(global_config, config_file, handle_errors=True,
+                    timing=False, startup_profile=None,
+                    readonly_database=None, readonly_writable_paths='',
+                    warmup_file=None, **options):
     handle_errors = asbool(handle_errors)
-    app = getWSGIApplication(config_file, handle_errors=handle_errors)
+    readonly_rule = None
+    if readonly_database is not None:
+        readonly_rule = ReadOnlyRule(
+            writable_paths=readonly_writable_paths.split())
+    app = getWSGIApplication(config_file, handle_errors=handle_errors,
+                             timing=asbool(timing),
+                             startup_profile=startup_profile,
+                             readonly_database=readonly_database,
+                             readonly_rule=readonly_rule,
+                             warmup_file=warmup_file)
     zope.event.notify(zope.processlifetime.ProcessStarting())
     return app
@@ -0,0 +1,452 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Serve the publisher from several forked worker processes.
+
+The ZCML configuration is executed once in the master process.  The
+workers are forked afterwards, so they share the component registry
+copy-on-write and start quickly.  Each worker opens the database itself,
+as database connections must not be shared across processes.
+
+So all workers see the same data, the databases must use a storage which
+several processes can open at the same time, like ``ZEO`` or
+``RelStorage``.  A ``FileStorage`` is locked by the first worker opening
+it, and ``MappingStorage`` and ``DemoStorage`` keep their data in the
+memory of each worker, so ``PreforkServer`` refuses to start more than one
+worker with them.
+
+``ReloadingServer`` reloads the configuration without downtime: on
+``SIGHUP`` it starts a new ``PreforkServer`` process on the same listening
+socket.  Once it has executed the configuration and forked its workers,
+the old one is asked to stop: its workers stop accepting connections and
+finish the requests in flight.  The kernel hands new connections to
+whichever process accepts them, so none are refused meanwhile.  If the new
+configuration cannot be loaded, the old processes keep serving.  As the
+old and the new processes have the database open at the same time, this
+requires a shareable storage as well, even with a single worker.
+
+Reloading happens in new processes rather than by swapping the component
+registry of a running application: ZCML directives register components
+in the process-global registry, which persistent local site managers
+refer to, and have side effects outside of it, like security checkers,
+principals and interface declarations, so two configurations cannot
+coexist in one process.  A new process also picks up changed code.
+
+This only works on platforms supporting ``os.fork``.
+"""
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import wsgiref.simple_server
+
+import ZODB.config
+import zope.processlifetime
+from zope.app.publication.httpfactory import HTTPPublicationRequestFactory
+from zope.event import notify
+
+from zope.app.wsgi import WSGIPublisherApplication
+from zope.app.wsgi import configure
+from zope.app.wsgi import interfaces
+from zope.app.wsgi import loadOptions
+from zope.app.wsgi import openDatabase
+from zope.app.wsgi import warmup
+
+
+logger = logging.getLogger(__name__)
+
+# Workers exiting sooner than this many seconds after being started are
+# respawned with a delay, to avoid a busy loop if they cannot start at all.
+MIN_WORKER_LIFETIME = 1.0
+
+# The servers stop if this many workers, or ``PreforkServer`` processes of
+# ``ReloadingServer``, in a row fail to start.
+MAX_STARTUP_FAILURES = 5
+
+# Seconds between checks of ``ReloadingServer`` for signals and exited
+# processes.
+POLL_INTERVAL = 0.1
+
+
+# Storages which several processes cannot open at the same time, or which
+# keep their data in the memory of each process.
+_UNSHAREABLE_STORAGES = (
+    ZODB.config.FileStorage,
+    ZODB.config.MappingStorage,
+    ZODB.config.DemoStorage,
+)
+
+
+def checkShareableDatabases(options):
+    """Raise ValueError if a database cannot be shared by processes."""
+    names = []
+    for database in options.databases:
+        storage = database.config.storage
+        while isinstance(storage, ZODB.config.BlobStorage):
+            storage = storage.config.base
+        if isinstance(storage, _UNSHAREABLE_STORAGES):
+            names.append(repr(database.config.database_name
+                              or database.name or ''))
+    if names:
+        raise ValueError(
+            'The storage of the database(s) %s cannot be shared by several'
+            ' processes, use e.g. ZEO or RelStorage instead.'
+            % ', '.join(names))
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn,
+                          wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+
+
+def serveWSGIRef(application, sock):
+    """Serve an application on a listening socket using ``wsgiref``.
+
+    This is the default for ``PreforkServer``.  Production deployments may
+    want to pass a function using a better server instead, e.g.
+    ``lambda app, sock: waitress.serve(app, sockets=[sock])``.  It should
+    finish the requests in flight and return on ``SIGTERM``.
+    """
+    server = ThreadingWSGIServer(
+        sock.getsockname()[:2], wsgiref.simple_server.WSGIRequestHandler,
+        bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    host, port = sock.getsockname()[:2]
+    server.server_name = socket.getfqdn(host)
+    server.server_port = port
+    server.setup_environ()
+    server.set_app(application)
+    # Let ``server_close`` wait for the requests in flight, the master
+    # kills the worker if they take too long.
+    server.daemon_threads = False
+    # ``shutdown`` waits for ``serve_forever`` to return, so it cannot be
+    # called in the signal handler interrupting it.
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+        target=server.shutdown, daemon=True).start())
+    server.serve_forever()
+    server.server_close()
+
+
+class PreforkServer:
+    """Run the configuration once and fork ``workers`` worker processes.
+
+    The master process supervises the workers and restarts them if they
+    exit, unless ``MAX_STARTUP_FAILURES`` workers in a row exit right after
+    being started.  More than one worker requires storages which can be
+    shared by processes, see ``checkShareableDatabases``.
+
+    Sending ``SIGTERM`` or ``SIGINT`` to the master stops all workers,
+    which are killed if they did not finish the requests in flight after
+    ``graceful_timeout`` seconds.
+
+    If ``ready_fd`` is given, a byte is written to this file descriptor
+    after the workers were forked.
+    """
+
+    def __init__(self, configfile, host='127.0.0.1', port=8080, workers=2,
+                 schemafile=None, features=(),
+                 requestFactory=HTTPPublicationRequestFactory,
+                 handle_errors=True, serve=serveWSGIRef, warmup_file=None,
+                 graceful_timeout=30.0, ready_fd=None):
+        self.configfile = configfile
+        self.schemafile = schemafile
+        self.features = features
+        self.address = (host, port)
+        self.workers = workers
+        self.requestFactory = requestFactory
+        self.handle_errors = handle_errors
+        self.serve = serve
+        self.warmup_file = warmup_file
+        self.graceful_timeout = graceful_timeout
+        self.ready_fd = ready_fd
+        self.cacheWarmer = None
+        self.socket = None
+        self.children = {}
+        self.stopping = False
+        self.failures = 0
+
+    def bind(self):
+        self.socket = socket.create_server(self.address)
+        self.socket.set_inheritable(True)
+        return self.socket.getsockname()[:2]
+
+    def run(self):
+        options = loadOptions(self.configfile, self.schemafile)
+        if self.workers > 1:
+            checkShareableDatabases(options)
+        configure(options, self.features)
+        if self.socket is None:
+            self.bind()
+        logger.info('Listening on %s:%s with %d workers',
+                    *self.socket.getsockname()[:2], self.workers)
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        try:
+            for i in range(self.workers):
+                self._spawn(options)
+            if self.ready_fd is not None:
+                os.write(self.ready_fd, b'1')
+                os.close(self.ready_fd)
+                self.ready_fd = None
+            self._supervise(options)
+            if self.failures >= MAX_STARTUP_FAILURES:
+                raise RuntimeError('The workers could not be started.')
+        finally:
+            self._killChildren()
+            self.socket.close()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        self._killChildren()
+        if self.graceful_timeout:
+            signal.signal(signal.SIGALRM, lambda signum, frame:
+                          self._killChildren(signal.SIGKILL))
+            signal.setitimer(signal.ITIMER_REAL, self.graceful_timeout)
+
+    def _killChildren(self, signum=signal.SIGTERM):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self, options):
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                self.failures += 1
+            else:
+                self.failures = 0
+            if self.failures >= MAX_STARTUP_FAILURES:
+                logger.error('Worker %d exited with status %d, %d workers'
+                             ' in a row failed to start, stopping.',
+                             pid, os.waitstatus_to_exitcode(status),
+                             self.failures)
+                self.stopping = True
+                self._killChildren()
+                continue
+            logger.warning('Worker %d exited with status %d, restarting.',
+                           pid, os.waitstatus_to_exitcode(status))
+            if self.failures:
+                time.sleep(MIN_WORKER_LIFETIME)
+            if not self.stopping:
+                self._spawn(options)
+
+    def _spawn(self, options):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+        # In the worker.
+        status = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self.children = {}
+            self.serve(self.makeApplication(options), self.socket)
+            status = 0
+        except BaseException:
+            logger.exception('Worker %d failed.', os.getpid())
+        finally:
+            # ``os._exit`` skips the ``atexit`` handler saving the hot oids.
+            if self.cacheWarmer is not None:
+                self.cacheWarmer.stop(timeout=1.0)
+            os._exit(status)
+
+    def makeApplication(self, options):
+        """Open the database and create the application in a worker."""
+        db = openDatabase(options)
+        if self.warmup_file:
+            self.cacheWarmer = warmup.CacheWarmer(db, self.warmup_file)
+            self.cacheWarmer.start()
+        application = WSGIPublisherApplication(
+            db, self.requestFactory, self.handle_errors)
+        notify(interfaces.WSGIPublisherApplicationCreated(application))
+        notify(zope.processlifetime.ProcessStarting())
+        return application
+
+
+class ReloadingServer:
+    """Serve from a ``PreforkServer`` process, replacing it on ``SIGHUP``.
+
+    Each ``PreforkServer`` is started in a new Python process, so it
+    executes the configuration from scratch.  Sending ``SIGTERM`` or
+    ``SIGINT`` stops all processes.  The old and the new process use the
+    databases at the same time while reloading, so their storages must be
+    shareable, see ``checkShareableDatabases``.
+    """
+
+    def __init__(self, configfile, host='127.0.0.1', port=8080, workers=2,
+                 warmup_file=None, graceful_timeout=30.0):
+        self.configfile = configfile
+        self.address = (host, port)
+        self.workers = workers
+        self.warmup_file = warmup_file
+        self.graceful_timeout = graceful_timeout
+        self.socket = None
+        self.current = None
+        self.retiring = []
+        self.reloading = False
+        self.stopping = False
+        self.failures = 0
+
+    def bind(self):
+        self.socket = socket.create_server(self.address)
+        self.socket.set_inheritable(True)
+        return self.socket.getsockname()[:2]
+
+    def run(self):
+        checkShareableDatabases(loadOptions(self.configfile))
+        if self.socket is None:
+            self.bind()
+        logger.info('Listening on %s:%s', *self.socket.getsockname()[:2])
+
+        signal.signal(signal.SIGHUP, self._reload)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        try:
+            self.current = self._start()
+            if self.current is None:
+                raise RuntimeError('The server could not be started.')
+            self._supervise()
+        finally:
+            for process in [self.current] + self.retiring:
+                if process is not None and process.poll() is None:
+                    process.terminate()
+            for process in [self.current] + self.retiring:
+                if process is not None:
+                    process.wait()
+            self.socket.close()
+
+    def _reload(self, signum, frame):
+        self.reloading = True
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _supervise(self):
+        while not self.stopping:
+            if self.reloading:
+                self.reloading = False
+                process = self._start()
+                if process is None:
+                    logger.error('Reloading the configuration failed, '
+                                 'keeping process %d.', self.current.pid)
+                else:
+                    logger.info('Reloaded the configuration, replacing '
+                                'process %d by %d.',
+                                self.current.pid, process.pid)
+                    self.current.terminate()
+                    self.retiring.append(self.current)
+                    self.current = process
+            elif self.current.poll() is not None:
+                logger.warning('Process %d exited with status %d, '
+                               'restarting.', self.current.pid,
+                               self.current.returncode)
+                time.sleep(MIN_WORKER_LIFETIME)
+                process = self._start()
+                if process is not None:
+                    self.failures = 0
+                    self.current = process
+                else:
+                    self.failures += 1
+                    if self.failures >= MAX_STARTUP_FAILURES:
+                        raise RuntimeError(
+                            'The server could not be restarted.')
+            self.retiring = [
+                process for process in self.retiring
+                if process.poll() is None]
+            time.sleep(POLL_INTERVAL)
+
+    def _start(self):
+        """Start a ``PreforkServer`` process and wait until it is ready.
+
+        Return None if it exits before.
+        """
+        ready_r, ready_w = os.pipe()
+        args = [sys.executable, '-m', 'zope.app.wsgi.prefork',
+                '-C', self.configfile, '-w', str(self.workers),
+                '--graceful-timeout', str(self.graceful_timeout),
+                '--listen-fd', str(self.socket.fileno()),
+                '--ready-fd', str(ready_w)]
+        if self.warmup_file:
+            args += ['--warmup-file', self.warmup_file]
+        try:
+            process = subprocess.Popen(
+                args, pass_fds=(self.socket.fileno(), ready_w))
+        finally:
+            os.close(ready_w)
+        try:
+            while not self.stopping:
+                readable = select.select([ready_r], [], [], POLL_INTERVAL)[0]
+                if readable and os.read(ready_r, 1):
+                    return process
+                if readable or process.poll() is not None:
+                    # The pipe was closed without writing to it.
+                    process.wait()
+                    return None
+            return process
+        finally:
+            os.close(ready_r)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Serve Zope from several forked worker processes.')
+    parser.add_argument('-C', '--config', required=True,
+                        help='path to the zope.conf configuration file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('-w', '--workers', type=int, default=2)
+    parser.add_argument('--warmup-file',
+                        help='file to save the hot objects of the caches to')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='seconds to wait for requests when stopping')
+    parser.add_argument('--reload', action='store_true',
+                        help='reload the configuration on SIGHUP')
+    # Used by ReloadingServer to start PreforkServer processes.
+    parser.add_argument('--listen-fd', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--ready-fd', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    if options.reload:
+        ReloadingServer(options.config, options.host, options.port,
+                        options.workers, warmup_file=options.warmup_file,
+                        graceful_timeout=options.graceful_timeout).run()
+        return
+    server = PreforkServer(options.config, options.host, options.port,
+                           options.workers, warmup_file=options.warmup_file,
+                           graceful_timeout=options.graceful_timeout,
+                           ready_fd=options.ready_fd)
+    if options.listen_fd is not None:
+        server.socket = socket.socket(fileno=options.listen_fd)
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
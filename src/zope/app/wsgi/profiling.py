@@ -0,0 +1,149 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Profiling of single requests on demand.
+
+Pass a ``RequestProfiler`` to ``WSGIPublisherApplication``.  A request is
+profiled if
+
+- the ``zope.app.wsgi.profile`` environment key is true, which only the
+  server or a middleware can set, or
+
+- it has an ``X-Zope-Profile`` header signed with the profiler's secret,
+  see ``sign()``.
+
+Its ``publish()`` call then runs under ``cProfile`` and the statistics are
+written to a directory, where they can be read using ``pstats``.
+"""
+import cProfile
+import hashlib
+import hmac
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+ENVIRON_KEY = 'zope.app.wsgi.profile'
+HEADER_KEY = 'HTTP_X_ZOPE_PROFILE'
+
+_unsafe_re = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def _signature(secret, path, expires):
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    message = f'{expires}:{path}'.encode('utf-8')
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def sign(secret, path, expires):
+    """Return a value for the ``X-Zope-Profile`` header.
+
+    It authorizes profiling requests for ``path`` (the ``PATH_INFO``) until
+    the Unix timestamp ``expires``.
+    """
+    expires = int(expires)
+    return f'{expires}:{_signature(secret, path, expires)}'
+
+
+class RequestProfiler:
+    """Profile requests asking for it and write the statistics to a directory.
+
+    At most one request is profiled at a time, and at most one every
+    ``min_interval`` seconds; further requests asking for it are published
+    without profiling.  Signed headers are only accepted if a ``secret`` is
+    given.
+    """
+
+    def __init__(self, directory, secret=None, min_interval=10.0):
+        self.directory = directory
+        self.secret = secret
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last = None
+        self._running = False
+        self._counter = itertools.count(1)
+
+    def isAuthorized(self, environ):
+        if environ.get(ENVIRON_KEY):
+            return True
+        header = environ.get(HEADER_KEY)
+        if not header or self.secret is None:
+            return False
+        expires, _, signature = header.partition(':')
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        expected = _signature(
+            self.secret, environ.get('PATH_INFO', ''), int(expires))
+        return hmac.compare_digest(expected, signature)
+
+    def isRequested(self, environ):
+        """Tell whether to profile a request.
+
+        This reserves the profiling slot if the request is authorized; it
+        is released by ``runcall``.
+        """
+        if not self.isAuthorized(environ):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if self._running or (self._last is not None and
+                                 now - self._last < self.min_interval):
+                logger.info('Not profiling %s, rate limit exceeded.',
+                            environ.get('PATH_INFO'))
+                return False
+            self._running = True
+            self._last = now
+        return True
+
+    def runcall(self, environ, func, *args, **kw):
+        """Call a function under the profiler and write the statistics.
+
+        Errors of the profiler are logged, they never fail the call.
+        """
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Since Python 3.12 only one profiler can be active.
+                logger.warning('Not profiling %s, another profiler is '
+                               'active.', environ.get('PATH_INFO'))
+                return func(*args, **kw)
+            try:
+                return func(*args, **kw)
+            finally:
+                profiler.disable()
+                self._write(environ, profiler)
+        finally:
+            with self._lock:
+                self._running = False
+
+    def _write(self, environ, profiler):
+        path = os.path.join(self.directory, '%s-%d-%d-%s.prof' % (
+            time.strftime('%Y%m%dT%H%M%S'), os.getpid(),
+            next(self._counter),
+            _unsafe_re.sub('_', environ.get('PATH_INFO', ''))[:100]))
+        try:
+            profiler.dump_stats(path)
+        except Exception:
+            logger.exception('Cannot write the profile of %s to %s',
+                             environ.get('PATH_INFO'), path)
+        else:
+            logger.info('Wrote profile of %s to %s',
+                        environ.get('PATH_INFO'), path)
@@ -0,0 +1,116 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""WSGI middleware limiting and spooling request bodies."""
+import tempfile
+
+
+BLOCK_SIZE = 65536
+
+
+def _reject(start_response, status='413 Request Entity Too Large',
+            body=b'The request body is too large.'):
+    start_response(status, [('Content-Type', 'text/plain'),
+                            ('Content-Length', str(len(body)))])
+    return [body]
+
+
+class RequestBodyMiddleware:
+    """Limit the size of request bodies and spool bodies of unknown size.
+
+    Requests announcing a ``Content-Length`` above ``max_size`` are
+    answered with ``413`` before their body is read, requests with an
+    invalid ``Content-Length`` with ``400``.
+
+    Bodies sent without a ``Content-Length`` (using chunked transfer
+    coding) are read in blocks into a file kept in memory up to
+    ``spool_size`` bytes and on disk beyond that.  The application then
+    gets this file as ``wsgi.input`` together with its ``CONTENT_LENGTH``,
+    so even huge uploads are handled with constant memory.  Reading stops
+    with a ``413`` as soon as ``max_size`` is exceeded.
+
+    A ``max_size`` of None means no limit.
+    """
+
+    def __init__(self, application, max_size=None, spool_size=1024 * 1024):
+        self.application = application
+        self.max_size = max_size
+        self.spool_size = spool_size
+
+    def __call__(self, environ, start_response):
+        length = environ.get('CONTENT_LENGTH')
+        if length:
+            try:
+                length = int(length)
+            except ValueError:
+                length = -1
+            if length < 0:
+                return _reject(start_response, '400 Bad Request',
+                               b'The Content-Length is invalid.')
+            if self.max_size is not None and length > self.max_size:
+                return _reject(start_response)
+            return self.application(environ, start_response)
+
+        chunked = 'chunked' in environ.get(
+            'HTTP_TRANSFER_ENCODING', '').lower()
+        if not (chunked or environ.get('wsgi.input_terminated')):
+            return self.application(environ, start_response)
+
+        spool = self._spool(environ['wsgi.input'])
+        if spool is None:
+            return _reject(start_response)
+        environ['CONTENT_LENGTH'] = str(spool.tell())
+        spool.seek(0)
+        environ['wsgi.input'] = spool
+        try:
+            result = self.application(environ, start_response)
+        except BaseException:
+            spool.close()
+            raise
+        return ClosingIterator(result, spool.close)
+
+    def _spool(self, stream):
+        """Copy a stream into a spooled file.
+
+        Return None if the stream is larger than allowed.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        size = 0
+        while True:
+            data = stream.read(BLOCK_SIZE)
+            if not data:
+                return spool
+            size += len(data)
+            if self.max_size is not None and size > self.max_size:
+                spool.close()
+                return None
+            spool.write(data)
+
+
+class ClosingIterator:
+    """Iterate over a response body and call a function when closed."""
+
+    def __init__(self, result, callback):
+        self._result = result
+        self._callback = callback
+
+    def __iter__(self):
+        return iter(self._result)
+
+    def close(self):
+        try:
+            close = getattr(self._result, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._callback()
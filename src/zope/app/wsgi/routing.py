@@ -0,0 +1,33 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Rules routing requests to a read-only database."""
+
+
+class ReadOnlyRule:
+    """Decide whether a request is published using the read-only database.
+
+    Requests using one of ``methods`` are, unless their path starts with
+    one of ``writable_paths``.  Use these for views writing on safe
+    requests, e.g. to record a login.
+    """
+
+    def __init__(self, methods=('GET', 'HEAD'), writable_paths=()):
+        self.methods = frozenset(method.upper() for method in methods)
+        self.writable_paths = tuple(writable_paths)
+
+    def __call__(self, environ):
+        if environ.get('REQUEST_METHOD', 'GET').upper() not in self.methods:
+            return False
+        return not environ.get('PATH_INFO', '').startswith(
+            self.writable_paths)
@@ -0,0 +1,184 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Profiling of the application startup.
+
+Set the ``ZOPE_APP_WSGI_STARTUP_PROFILE`` environment variable (or the
+``startup_profile`` Paste option) to the path of a file, and
+``getWSGIApplication()`` writes a JSON report there.  It contains the time
+spent in each phase of the startup, and the most expensive ZCML directives
+and imports during the execution of the ZCML configuration.  The times of
+directives like ``include`` contain the times of the directives they
+contain.
+"""
+import contextlib
+import cProfile
+import json
+import platform
+import pstats
+import sys
+import time
+
+from zope.app.appsetup import appsetup
+
+
+ENVIRONMENT_VARIABLE = 'ZOPE_APP_WSGI_STARTUP_PROFILE'
+
+# The version of the report format.
+REPORT_VERSION = 1
+
+
+class StartupProfile:
+    """Collect timings of the startup phases."""
+
+    def __init__(self, top=20):
+        self.top = top
+        self.phases = []
+        self.directives = []
+        self.imports = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    @contextlib.contextmanager
+    def profiledPhase(self, name):
+        """Time a phase and profile its directive handlers and imports."""
+        profiler = cProfile.Profile()
+        with self.phase(name):
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+        self._analyze(pstats.Stats(profiler).stats, _getHandlers())
+
+    def _analyze(self, stats, handlers):
+        modules = {getattr(module, '__file__', None): name
+                   for name, module in list(sys.modules.items())}
+        directives = {}
+        imports = []
+        for key, entry in stats.items():
+            filename, line, function = key
+            calls, cumulative = entry[1], entry[3]
+            if function == '<module>':
+                imports.append({
+                    'module': modules.get(filename, filename),
+                    'seconds': cumulative,
+                })
+            elif key in handlers:
+                directive = handlers[key]
+                item = directives.setdefault(directive, {
+                    'directive': directive,
+                    'handler': '%s:%s' % (
+                        modules.get(filename, filename), function),
+                    'calls': 0,
+                    'seconds': 0.0,
+                })
+                item['calls'] += calls
+                item['seconds'] += cumulative
+
+        def key(item):
+            return item['seconds']
+
+        self.directives = sorted(
+            directives.values(), key=key, reverse=True)[:self.top]
+        self.imports = sorted(imports, key=key, reverse=True)[:self.top]
+
+    def report(self):
+        return {
+            'version': REPORT_VERSION,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'total': sum(seconds for name, seconds in self.phases),
+            'phases': [{'name': name, 'seconds': seconds}
+                       for name, seconds in self.phases],
+            'directives': self.directives,
+            'imports': self.imports,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class NullProfile:
+    """A profile doing nothing, used if profiling is disabled."""
+
+    def phase(self, name):
+        return contextlib.nullcontext()
+
+    profiledPhase = phase
+
+    def write(self, path):
+        pass
+
+
+nullProfile = NullProfile()
+
+
+def _getCode(handler):
+    """Return the profiler keys of the code run by a directive handler.
+
+    Methods of a class handler which subclasses inherit are left out, as
+    their calls cannot be told apart from the calls by the subclasses.
+    This is the case for ``GroupingContextDecorator``, the handler of the
+    ``module`` directive and the base class of all grouping directives.
+    """
+    if isinstance(handler, type):
+        subclasses = _getSubclasses(handler)
+        functions = [value for name, value in vars(handler).items()
+                     if hasattr(value, '__code__') and not any(
+                         _getDefiningClass(subclass, name) is handler
+                         for subclass in subclasses)]
+    else:
+        functions = [getattr(handler, '__func__', handler)]
+    for function in functions:
+        code = getattr(function, '__code__', None)
+        if code is not None:
+            yield code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _getSubclasses(cls):
+    subclasses = []
+    for subclass in cls.__subclasses__():
+        subclasses.append(subclass)
+        subclasses.extend(_getSubclasses(subclass))
+    return subclasses
+
+
+def _getDefiningClass(cls, name):
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return klass
+    return None
+
+
+def _getHandlers():
+    """Map profiler keys to the names of the directives they handle.
+
+    Code used by the handlers of several directives is left out.
+    """
+    context = appsetup.getConfigContext()
+    directives = {}
+    for entry in getattr(context, '_docRegistry', ()):
+        (namespace, name), handler = entry[0], entry[3]
+        directive = '%s %s' % (namespace, name) if namespace else name
+        for key in _getCode(handler):
+            directives.setdefault(key, set()).add(directive)
+    return {key: names.pop() for key, names in directives.items()
+            if len(names) == 1}
@@ -12,17 +12,29 @@
 #
 ##############################################################################
 import base64
-import http.client as httpclient
+import contextlib
+import io
+import os
+import pickle
 import re
+import sys
 import typing
+import unittest
 import xmlrpc.client
 from io import BytesIO
 
 import transaction
 import webtest
+import ZODB.interfaces
+from webob.descriptors import parse_int_safe
+from webob.headers import ResponseHeaders
+from webob.request import environ_from_url
 from webtest import TestRequest
+from ZODB.DB import DB
 from zope.app.appsetup.testlayer import ZODBLayer
+from zope.app.publication.httpfactory import HTTPPublicationRequestFactory
 
+from zope import component
 from zope.app.wsgi import WSGIPublisherApplication
 
 
@@ -61,6 +73,7 @@ class TransactionMiddleware:
     - It commits and synchronises the current transaction before and
       after the test.
 
+    The commit is skipped if the transaction has nothing to commit.
     """
 
     def __init__(self, root_factory, wsgi_stack):
@@ -71,7 +84,16 @@ class TransactionMiddleware:
         self.wsgi_stack = wsgi_stack
 
     def __call__(self, environ, start_response):
-        transaction.commit()
+        txn = transaction.get()
+        # Committing an unchanged transaction still notifies every
+        # synchronizer, which adds up over the requests of a large suite.
+        # The joined resources are private to ``transaction``, so commit
+        # anyway if they are not available.
+        resources = getattr(txn, '_resources', None)
+        if (resources is None or resources or txn.isDoomed() or
+                any(txn.getBeforeCommitHooks()) or
+                any(txn.getAfterCommitHooks())):
+            txn.commit()
         yield from self.wsgi_stack(environ, start_response)
         self.root_factory()._p_jar.sync()
 
@@ -130,6 +152,47 @@ class BrowserLayer(ZODBLayer):
             )
         )
 
+    @contextlib.contextmanager
+    def snapshot(self):
+        """Discard the changes made to the database in a ``with`` block.
+
+        Every test already gets its own DemoStorage stacked on the storage
+        of the layer, so its changes are discarded in constant time after
+        the test.  This stacks another DemoStorage for the block, so a test
+        can return to a known state without tearing anything down.
+
+        Inside the block, `getRootFolder` and the application built by
+        `make_wsgi_app` use the new database.  Objects loaded before the
+        block must not be changed in it.
+        """
+        transaction.commit()
+        saved_db, saved_connection = self.db, self.connection
+        application = getattr(self, '_application', None)
+        if application is not None:
+            saved_factory = application.requestFactory
+        db = DB(saved_db.storage.push(), database_name=self.db_name)
+        self._useDatabase(db, None)
+        try:
+            yield
+        finally:
+            transaction.abort()
+            if self.connection is not None:
+                self.connection.close()
+            if application is not None:
+                application.requestFactory = saved_factory
+                application.db = saved_db
+            self._useDatabase(saved_db, saved_connection)
+            db.close()
+
+    def _useDatabase(self, db, connection):
+        self.db = db
+        self.connection = connection
+        component.provideUtility(db, ZODB.interfaces.IDatabase, self.db_name)
+        application = getattr(self, '_application', None)
+        if application is not None and application.db is not db:
+            application.requestFactory = HTTPPublicationRequestFactory(db)
+            application.db = db
+
     def tearDown(self):
         if self.allowTearDown:
             super().tearDown()
@@ -137,6 +200,158 @@ class BrowserLayer(ZODBLayer):
             raise NotImplementedError
 
 
+class WorkerFailure(Exception):
+    """A test failed in a worker process of `ParallelTests`.
+
+    The message is the formatted traceback.
+    """
+
+
+def _flatten(tests):
+    if isinstance(tests, unittest.TestSuite):
+        for test in tests:
+            yield from _flatten(test)
+    else:
+        yield tests
+
+
+class ParallelTests:
+    """Run tests of a `BrowserLayer` in several forked worker processes.
+
+    The layer is set up once in the parent process, so the ZCML is only
+    loaded once.  The workers are forked afterwards and each one runs a
+    share of the tests.  As the layer stacks a DemoStorage on its base
+    storage for every test, the workers do not see the changes made by
+    each other.  Tests call ``make_wsgi_app`` in their set up as usual, so
+    the application uses the database of the worker.
+
+    The results and the output of the tests are reported to the result of
+    the parent process test by test, once a worker is done.  The test
+    runner cannot select single tests from this object, though.
+
+    Without ``os.fork`` or with a single worker the tests are run serially
+    in the parent process.
+    """
+
+    def __init__(self, tests, workers=None, layer=None):
+        self.tests = list(_flatten(tests))
+        self.workers = workers or os.cpu_count() or 1
+        if layer is not None:
+            self.layer = layer
+
+    def __repr__(self):
+        return '<{} of {} tests>'.format(
+            self.__class__.__name__, len(self.tests))
+
+    def id(self):
+        return '{}.{}({})'.format(
+            self.__class__.__module__, self.__class__.__name__,
+            ', '.join(test.id() for test in self.tests[:3]) +
+            (', ...' if len(self.tests) > 3 else ''))
+
+    __str__ = id
+
+    def shortDescription(self):
+        return None
+
+    def countTestCases(self):
+        return len(self.tests)
+
+    def __call__(self, result):
+        return self.run(result)
+
+    def run(self, result):
+        if self.workers <= 1 or not hasattr(os, 'fork'):
+            self._report(result, self._run(self.tests))
+        else:
+            self._runInWorkers(result)
+        return result
+
+    def _run(self, tests):
+        layer = getattr(self, 'layer', None)
+        records = []
+        stdout, stderr = sys.stdout, sys.stderr
+        for test in tests:
+            sys.stdout = sys.stderr = output = io.StringIO()
+            test_result = unittest.TestResult()
+            if layer is not None:
+                layer.testSetUp()
+            try:
+                test(test_result)
+            finally:
+                if layer is not None:
+                    layer.testTearDown()
+                sys.stdout, sys.stderr = stdout, stderr
+            record = [output.getvalue(), None, None]
+            for kind in ('errors', 'failures', 'skipped', 'expectedFailures'):
+                for failed_test, text in getattr(test_result, kind):
+                    record[1:] = [kind, text]
+            if test_result.unexpectedSuccesses:
+                record[1:] = ['unexpectedSuccesses', None]
+            records.append(record)
+        return records
+
+    def _runInWorkers(self, result):
+        workers = []
+        for n in range(min(self.workers, len(self.tests))):
+            indexes = range(n, len(self.tests), self.workers)
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # In the worker process:
+                os.close(read_fd)
+                status = 1
+                try:
+                    records = self._run([self.tests[i] for i in indexes])
+                    with os.fdopen(write_fd, 'wb') as pipe:
+                        pickle.dump(records, pipe)
+                    status = 0
+                finally:
+                    os._exit(status)
+            os.close(write_fd)
+            workers.append((pid, read_fd, indexes))
+
+        for pid, read_fd, indexes in workers:
+            with os.fdopen(read_fd, 'rb') as pipe:
+                data = pipe.read()
+            os.waitpid(pid, 0)
+            try:
+                records = pickle.loads(data)
+            except Exception:
+                records = [
+                    ['', 'errors', 'The worker process died.']
+                ] * len(indexes)
+            self._report(
+                result, records, [self.tests[i] for i in indexes])
+
+    def _report(self, result, records, tests=None):
+        if tests is None:
+            tests = self.tests
+        for test, (output, kind, text) in zip(tests, records):
+            # The test runner of zope.testrunner calls ``testSetUp`` and
+            # ``testTearDown`` of the layer here, which is cheap compared to
+            # running the test.
+            result.startTest(test)
+            try:
+                if output:
+                    sys.stdout.write(output)
+                if kind is None:
+                    result.addSuccess(test)
+                elif kind == 'skipped':
+                    result.addSkip(test, text)
+                elif kind == 'unexpectedSuccesses':
+                    result.addUnexpectedSuccess(test)
+                else:
+                    add = {'errors': result.addError,
+                           'failures': result.addFailure,
+                           'expectedFailures': result.addExpectedFailure,
+                           }[kind]
+                    add(test,
+                        (WorkerFailure, WorkerFailure(text.rstrip()), None))
+            finally:
+                result.stopTest(test)
+
+
 class NotInBrowserLayer(Exception):
     """The current test is not running in a layer inheriting from
     BrowserLayer.
@@ -220,11 +435,156 @@ def encodeMultipartFormdata(
     return content_type.encode(), content
 
 
+_HEADER_KEYS = {'CONTENT-TYPE': 'CONTENT_TYPE',
+                'CONTENT-LENGTH': 'CONTENT_LENGTH'}
+
+
+def _environFromString(string):
+    """Return the WSGI environment for a raw HTTP request.
+
+    The result is the same as ``TestRequest.from_file(...).environ``, but
+    no request object is created.
+    """
+    fp = BytesIO(string)
+    start_line = fp.readline()
+    try:
+        method, resource, http_version = start_line.rstrip(b'\r\n').split(
+            None, 2)
+    except ValueError:
+        raise ValueError('Bad HTTP request line: %r' % start_line)
+    environ = environ_from_url(resource.decode('utf-8'))
+    environ['REQUEST_METHOD'] = method.decode('utf-8').upper()
+    environ['SERVER_PROTOCOL'] = http_version.decode('utf-8')
+    del environ['HTTP_HOST']
+    while True:
+        line = fp.readline()
+        if not line.strip():
+            break
+        name, value = line.split(b':', 1)
+        name = name.decode('utf-8').upper()
+        key = _HEADER_KEYS.get(name) or 'HTTP_' + name.replace('-', '_')
+        value = value.decode('utf-8').strip()
+        if key in environ:
+            value = environ[key] + ', ' + value
+        environ[key] = value
+
+    try:
+        content_length = int(environ.get('CONTENT_LENGTH'))
+    except (TypeError, ValueError):
+        body = fp.read()
+    else:
+        body = fp.read(content_length)
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['wsgi.input'] = BytesIO(body)
+    environ['webob.is_body_seekable'] = True
+    return environ
+
+
+class _Request:
+    """The request passed to `FakeResponse` by `http()`.
+
+    Attributes other than ``environ`` are looked up on a
+    `webtest.TestRequest` created on first use.
+    """
+
+    def __init__(self, environ):
+        self.environ = environ
+
+    def __getattr__(self, name):
+        request = self.__dict__.get('_request')
+        if request is None:
+            request = self._request = TestRequest(self.environ)
+        return getattr(request, name)
+
+
+class _Response:
+    """The response passed to `FakeResponse` by `http()`.
+
+    It provides what `FakeResponse` needs without parsing anything; other
+    attributes are looked up on a `webtest.TestResponse` created on first
+    use.
+    """
+
+    def __init__(self, status, headerlist, app_iter):
+        self.status = status
+        self.headerlist = headerlist
+        self._app_iter = app_iter
+
+    @property
+    def status_int(self):
+        return int(self.status.split()[0])
+
+    @property
+    def headers(self):
+        return ResponseHeaders.view_list(self.headerlist)
+
+    @property
+    def body(self):
+        # Like ``webob.Response.body``: close the body iterable and set the
+        # Content-Length once the body is known.
+        app_iter = self._app_iter
+        if isinstance(app_iter, list) and len(app_iter) == 1:
+            return app_iter[0]
+        try:
+            body = b''.join(app_iter)
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+        self._app_iter = [body]
+        if body:
+            headers = self.headers
+            length = parse_int_safe(headers.get('Content-Length'))
+            if length is None:
+                headers['Content-Length'] = str(len(body))
+            elif length != len(body):
+                raise AssertionError(
+                    'Content-Length is different from actual app_iter '
+                    'length (%r!=%r)' % (length, len(body)))
+        return body
+
+    def __getattr__(self, name):
+        response = self.__dict__.get('_response')
+        if response is None:
+            # The body iterable can be consumed only once, so both
+            # responses share the body read by `body`.
+            response = self._response = TestRequest.ResponseClass(
+                status=self.status, headerlist=self.headerlist,
+                app_iter=[self.body])
+        return getattr(response, name)
+
+
+def _callApplication(wsgi_app, environ):
+    """Call an application like `TestRequest.get_response` does.
+
+    Returns the status, the headers and the body as a list.
+    """
+    captured = []
+    output = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None:
+            raise exc_info[1].with_traceback(exc_info[2])
+        captured[:] = [status, headers]
+        return output.append
+
+    app_iter = wsgi_app(environ, start_response)
+    if output or not captured:
+        try:
+            output.extend(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        app_iter = output
+    status, headers = captured
+    return status, list(headers), app_iter
+
+
 def http(wsgi_app, string, handle_errors=True):
-    request = TestRequest.from_file(BytesIO(string.lstrip()))
-    request.environ['wsgi.handleErrors'] = handle_errors
-    response = request.get_response(wsgi_app)
-    return FakeResponse(response, request=request)
+    environ = _environFromString(string.lstrip())
+    environ['wsgi.handleErrors'] = handle_errors
+    response = _Response(*_callApplication(wsgi_app, environ))
+    return FakeResponse(response, request=_Request(environ))
 
 
 class FakeSocket:
@@ -237,56 +597,92 @@ class FakeSocket:
 
 
 class XMLRPCTestTransport(xmlrpc.client.Transport):
-    """xmlrpc.client lib transport that delegates to http().
+    """xmlrpc.client lib transport that calls a WSGI application in-process.
 
     It can be used like a normal transport, including support for basic
-    authentication.
+    authentication.  ``wsgi_app`` is the application to call or a
+    `BrowserLayer`, in which case an application is made by the layer for
+    each request, so it uses the database of the current test.
+
+    ``system.multicall`` requests are split into single calls, so
+    `xmlrpc.client.MultiCall` works with publishers not supporting them.
     """
 
     verbose = False
     handleErrors = True
 
+    def __init__(self, *args, wsgi_app=None, **kw):
+        super().__init__(*args, **kw)
+        self.wsgi_app = wsgi_app
+
     def request(self, host, handler, request_body, verbose=0):
-        request = f"POST {handler} HTTP/1.0\n"
-        request += "Content-Length: %i\n" % len(request_body)
-        request += "Content-Type: text/xml\n"
+        if b'system.multicall' in request_body:
+            params, method = xmlrpc.client.loads(
+                request_body, use_builtin_types=self._use_builtin_types)
+            if method == 'system.multicall':
+                return (self._multicall(host, handler, params[0]),)
+        return self._call(host, handler, request_body)
+
+    def _multicall(self, host, handler, calls):
+        results = []
+        for call in calls:
+            request_body = xmlrpc.client.dumps(
+                tuple(call['params']), call['methodName'],
+                allow_none=True).encode('utf-8')
+            try:
+                results.append(list(
+                    self._call(host, handler, request_body)))
+            except xmlrpc.client.Fault as fault:
+                results.append({'faultCode': fault.faultCode,
+                                'faultString': fault.faultString})
+        return results
+
+    def _call(self, host, handler, request_body):
+        wsgi_app = self.wsgi_app
+        if wsgi_app is None:
+            raise ValueError(
+                'XMLRPCTestTransport needs a WSGI application or a layer.')
+        if isinstance(wsgi_app, BrowserLayer):
+            wsgi_app = wsgi_app.make_wsgi_app()
 
         host, extra_headers, x509 = self.get_host_info(host)
+        environ = environ_from_url(f'http://{host}{handler}')
+        environ['REQUEST_METHOD'] = 'POST'
+        environ['CONTENT_TYPE'] = 'text/xml'
+        environ['CONTENT_LENGTH'] = str(len(request_body))
+        environ['wsgi.input'] = BytesIO(request_body)
+        environ['wsgi.handleErrors'] = self.handleErrors
         if extra_headers:
-            request += "Authorization: {}\n".format(
-                dict(extra_headers)["Authorization"])
-
-        request += "\n" + request_body
-        # XXX: http() needs to be passed a wsgi app!  where do we get a wsgi
-        # app?
-        response = http(request, handle_errors=self.handleErrors)
-
-        errcode = response.getStatus()
-        errmsg = response.getStatusString()
-        # This is not the same way that the normal transport deals with the
-        # headers.
-        headers = response.getHeaders()
-
-        if errcode != 200:
-            raise xmlrpc.client.ProtocolError(
-                host + handler,
-                errcode, errmsg,
-                headers
-            )
-
-        res = httpclient.HTTPResponse(FakeSocket(response.getBody()))
-        res.begin()
-        return self.parse_response(res)
+            environ['HTTP_AUTHORIZATION'] = dict(
+                extra_headers)['Authorization']
+
+        status, headers, app_iter = _callApplication(wsgi_app, environ)
+        try:
+            errcode = int(status.split()[0])
+            if errcode != 200:
+                raise xmlrpc.client.ProtocolError(
+                    host + handler, errcode, status, sorted(headers))
+
+            parser, unmarshaller = self.getparser()
+            for chunk in app_iter:
+                parser.feed(chunk)
+            parser.close()
+            return unmarshaller.close()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
 
 
 def XMLRPCServerProxy(uri, transport=None, encoding=None,
-                      verbose=0, allow_none=0, handleErrors=True):
+                      verbose=0, allow_none=0, handleErrors=True,
+                      wsgi_app=None):
     """A factory that creates a server proxy using the XMLRPCTestTransport
     by default.
 
+    ``wsgi_app`` is the application or `BrowserLayer` the transport calls.
     """
     if transport is None:
-        transport = XMLRPCTestTransport()
+        transport = XMLRPCTestTransport(wsgi_app=wsgi_app)
     if isinstance(transport, XMLRPCTestTransport):
         transport.handleErrors = handleErrors
     return xmlrpc.client.ServerProxy(
@@ -12,10 +12,23 @@
 #
 ##############################################################################
 """WSGI tests"""
+import asyncio
 import doctest
 import io
+import os
 import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
 import unittest
+import unittest.mock
+import urllib.error
+import urllib.request
+import zlib
 
 import zope.component
 import zope.component.testing
@@ -115,6 +128,1639 @@ class WSGIPublisherApplicationTests(unittest.TestCase):
         list(app(environ, lambda status, headers: None))
         self.assertEqual('-', environ['wsgi.logging_info'])
 
+    def test_WSGIPublisherApplication___call___2(self):
+        """It reports phase timings if timing is enabled."""
+        from . import WSGIPublisherApplication
+        from .interfaces import IWSGIRequestTimedEvent
+
+        events = []
+        zope.event.subscribers.append(events.append)
+        self.addCleanup(zope.event.subscribers.remove, events.append)
+        app = WSGIPublisherApplication(timing=True)
+        environ = {'wsgi.input': io.BytesIO(b'')}
+        headers = []
+        list(app(environ, lambda status, h: headers.extend(h)))
+
+        timings = environ['zope.app.wsgi.timings']
+        self.assertEqual(['factory', 'publish', 'logging'], list(timings))
+        server_timing = dict(headers)['Server-Timing']
+        self.assertRegex(
+            server_timing,
+            r'^factory;dur=[\d.]+, publish;dur=[\d.]+, logging;dur=[\d.]+$')
+        timed = [e for e in events if IWSGIRequestTimedEvent.providedBy(e)]
+        self.assertEqual(1, len(timed))
+        self.assertIs(app, timed[0].application)
+        self.assertIs(timings, timed[0].timings)
+
+    def test_WSGIPublisherApplication___call___3(self):
+        """It adds no timing information by default."""
+        from . import WSGIPublisherApplication
+
+        app = WSGIPublisherApplication()
+        environ = {'wsgi.input': io.BytesIO(b'')}
+        headers = []
+        list(app(environ, lambda status, h: headers.extend(h)))
+        self.assertNotIn('zope.app.wsgi.timings', environ)
+        self.assertNotIn('Server-Timing', dict(headers))
+
+    def test_WSGIPublisherApplication___call___4(self):
+        """It registers requests with the watchdog while publishing."""
+        from . import WSGIPublisherApplication
+        from .watchdog import Watchdog
+
+        seen = []
+
+        class RecordingWatchdog(Watchdog):
+            def enter(self, request, path):
+                super().enter(request, path)
+                seen.extend(self.inflight())
+
+        watchdog = RecordingWatchdog(threshold=60)
+        self.addCleanup(watchdog.stop)
+        app = WSGIPublisherApplication(watchdog=watchdog)
+        environ = {'wsgi.input': io.BytesIO(b''), 'PATH_INFO': '/slow'}
+        list(app(environ, lambda status, headers: None))
+        self.assertEqual(['/slow'], [info['path'] for info in seen])
+        self.assertEqual([], watchdog.inflight())
+
+    def test_WSGIPublisherApplication___call___5(self):
+        """It profiles requests asking for it."""
+        import pstats
+
+        from . import WSGIPublisherApplication
+        from .profiling import RequestProfiler
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        app = WSGIPublisherApplication(
+            profiler=RequestProfiler(directory, min_interval=0))
+        environ = {'wsgi.input': io.BytesIO(b''), 'PATH_INFO': '/a/b'}
+        list(app(environ, lambda status, headers: None))
+        self.assertEqual([], os.listdir(directory))
+
+        environ = {'wsgi.input': io.BytesIO(b''), 'PATH_INFO': '/a/b',
+                   'zope.app.wsgi.profile': True}
+        list(app(environ, lambda status, headers: None))
+        [name] = os.listdir(directory)
+        self.assertTrue(name.endswith('-_a_b.prof'))
+        stats = pstats.Stats(os.path.join(directory, name))
+        self.assertIn('publish', [key[2] for key in stats.stats])
+
+    def test_WSGIPublisherApplication___call___6(self):
+        """It does not read the input stream if there is no body.
+
+        Retrying a request reads the body until EOF, which would block on
+        a socket.
+        """
+        from . import WSGIPublisherApplication
+        streams = []
+
+        def factory(db):
+            def createRequest(input_stream, env):
+                streams.append(input_stream)
+                raise RuntimeError
+            return createRequest
+
+        app = WSGIPublisherApplication(factory=factory)
+        for content_length in (None, '', '0'):
+            environ = {'wsgi.input': io.BytesIO(b'unread')}
+            if content_length is not None:
+                environ['CONTENT_LENGTH'] = content_length
+            with self.assertRaises(RuntimeError):
+                app(environ, None)
+            self.assertEqual(b'', streams.pop().read())
+            self.assertEqual(b'unread', environ['wsgi.input'].read())
+
+        for environ in [
+                {'CONTENT_LENGTH': '4'},
+                {'HTTP_TRANSFER_ENCODING': 'chunked'},
+                {'wsgi.input_terminated': True}]:
+            environ['wsgi.input'] = io.BytesIO(b'body')
+            with self.assertRaises(RuntimeError):
+                app(environ, None)
+            self.assertIs(environ['wsgi.input'], streams.pop())
+
+
+def run_asgi(app, scope, body_messages=()):
+    """Run an ASGI application and return the messages it sent."""
+    sent = []
+    messages = list(body_messages) or [{'type': 'http.request'}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+class ASGIApplicationTests(unittest.TestCase):
+    """Testing .asgi.ASGIApplication."""
+
+    def make_one(self, wsgi_app, **kw):
+        from .asgi import ASGIApplication
+        app = ASGIApplication(wsgi_app, **kw)
+        self.addCleanup(app.executor.shutdown)
+        return app
+
+    def test_environ_and_streamed_body(self):
+        seen = {}
+
+        def wsgi_app(environ, start_response):
+            seen.update(environ)
+            body = environ['wsgi.input'].read()
+            start_response('201 Created', [('Content-Type', 'text/plain')])
+            return [b'got ', body]
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/a b',
+                 'root_path': '', 'query_string': b'x=1',
+                 'headers': [(b'content-length', b'6'),
+                             (b'x-test', b'1'), (b'x-test', b'2')]}
+        sent = run_asgi(self.make_one(wsgi_app, max_workers=1), scope, [
+            {'type': 'http.request', 'body': b'abc', 'more_body': True},
+            {'type': 'http.request', 'body': b'def'}])
+        self.assertEqual('/a b', seen['PATH_INFO'])
+        self.assertEqual('x=1', seen['QUERY_STRING'])
+        self.assertEqual('6', seen['CONTENT_LENGTH'])
+        self.assertEqual('1,2', seen['HTTP_X_TEST'])
+        self.assertEqual(
+            {'type': 'http.response.start', 'status': 201,
+             'headers': [(b'content-type', b'text/plain')]}, sent[0])
+        self.assertEqual(
+            [b'got ', b'abcdef', b''], [m['body'] for m in sent[1:]])
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_readline_and_close(self):
+        closed = []
+
+        class Result:
+            def __iter__(self):
+                yield b'done'
+
+            def close(self):
+                closed.append(True)
+
+        def wsgi_app(environ, start_response):
+            lines = list(environ['wsgi.input'])
+            start_response('200 OK', [])
+            self.assertEqual([b'one\n', b'two'], lines)
+            return Result()
+
+        scope = {'type': 'http', 'method': 'PUT', 'path': '/'}
+        run_asgi(self.make_one(wsgi_app), scope, [
+            {'type': 'http.request', 'body': b'on', 'more_body': True},
+            {'type': 'http.request', 'body': b'e\ntwo'}])
+        self.assertEqual([True], closed)
+
+    def test_chunked_body_reaches_publisher(self):
+        bodies = []
+
+        def factory(db):
+            def createRequest(input_stream, env):
+                bodies.append(input_stream.read())
+                raise RuntimeError
+            return createRequest
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/',
+                 'headers': [(b'transfer-encoding', b'chunked')]}
+        with self.assertRaises(RuntimeError):
+            run_asgi(self.make_one(
+                zope.app.wsgi.WSGIPublisherApplication(factory=factory)),
+                scope, [
+                    {'type': 'http.request', 'body': b'ab', 'more_body': True},
+                    {'type': 'http.request', 'body': b'cd'}])
+        self.assertEqual([b'abcd'], bodies)
+
+    def test_write_callable(self):
+
+        def wsgi_app(environ, start_response):
+            write = start_response('200 OK', [])
+            write(b'written ')
+            return [b'and ', b'returned']
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/'}
+        sent = run_asgi(self.make_one(wsgi_app), scope)
+        self.assertEqual(
+            [b'written and ', b'returned', b''],
+            [m['body'] for m in sent[1:]])
+
+    def test_start_response_not_called(self):
+        app = self.make_one(lambda environ, start_response: [b'body'])
+        with self.assertRaisesRegex(RuntimeError, 'start_response'):
+            run_asgi(app, {'type': 'http', 'method': 'GET', 'path': '/'})
+
+    def test_max_workers_from_database_pool(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage(), pool_size=3)
+        self.addCleanup(db.close)
+        app = self.make_one(zope.app.wsgi.WSGIPublisherApplication(db))
+        self.assertEqual(3, app.executor._max_workers)
+
+    def test_lifespan(self):
+        app = self.make_one(lambda environ, start_response: [])
+        sent = run_asgi(app, {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual(
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+            [m['type'] for m in sent])
+
+
+def simple_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'Hello', b' World']
+
+
+class MetricsMiddlewareTests(unittest.TestCase):
+    """Testing .metrics.MetricsMiddleware."""
+
+    def call(self, app, path='/'):
+        environ = {'PATH_INFO': path, 'wsgi.input': io.BytesIO(b'')}
+        status = []
+        result = app(environ, lambda s, h, e=None: status.append(s))
+        body = b''.join(result)
+        if hasattr(result, 'close'):
+            result.close()
+        return status[0], body
+
+    def test_counts_requests(self):
+        from .metrics import MetricsMiddleware
+        app = MetricsMiddleware(simple_app, buckets=(0.5, 1))
+        self.call(app)
+        self.call(app)
+        self.assertEqual({'200': 2}, app.requests)
+        self.assertEqual(22, app.response_bytes)
+        self.assertEqual(0, app.in_flight)
+        self.assertEqual([2, 0, 0], app.bucket_counts)
+
+    def test_counts_errors(self):
+        from .metrics import MetricsMiddleware
+
+        def failing_app(environ, start_response):
+            raise ValueError
+
+        app = MetricsMiddleware(failing_app)
+        with self.assertRaises(ValueError):
+            self.call(app)
+        self.assertEqual({'500': 1}, app.requests)
+        self.assertEqual(0, app.in_flight)
+
+    def test_endpoint(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+
+        from .metrics import MetricsMiddleware
+        db = DB(MappingStorage())
+        self.addCleanup(db.close)
+        app = MetricsMiddleware(simple_app, db=db, buckets=(0.5,),
+                                path='/metrics')
+        self.call(app)
+        status, body = self.call(app, '/metrics')
+        self.assertEqual('200 OK', status)
+        lines = body.decode('utf-8').splitlines()
+        self.assertIn('zope_wsgi_requests_total{status="200"} 1', lines)
+        self.assertIn(
+            'zope_wsgi_request_duration_seconds_bucket{le="0.5"} 1', lines)
+        self.assertIn(
+            'zope_wsgi_request_duration_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('zope_wsgi_response_bytes_total 11', lines)
+        self.assertIn('zodb_pool_size{database="unnamed"} 7', lines)
+        # The metrics endpoint itself is not counted.
+        self.assertEqual({'200': 1}, app.requests)
+
+    def test_no_endpoint_by_default(self):
+        from .metrics import MetricsMiddleware
+        app = MetricsMiddleware(simple_app)
+        self.assertEqual(('200 OK', b'Hello World'),
+                         self.call(app, '/metrics'))
+
+    def test_file_wrapper_is_not_wrapped(self):
+        from .metrics import MetricsMiddleware
+
+        class FileWrapper:
+            def __init__(self, f):
+                self.f = f
+
+        def file_app(environ, start_response):
+            start_response('200 OK', [('Content-Length', '3')])
+            return environ['wsgi.file_wrapper'](io.BytesIO(b'abc'))
+
+        app = MetricsMiddleware(file_app)
+        environ = {'PATH_INFO': '/', 'wsgi.file_wrapper': FileWrapper}
+        result = app(environ, lambda s, h, e=None: None)
+        self.assertIsInstance(result, FileWrapper)
+        self.assertEqual(3, app.response_bytes)
+
+
+class CompressionMiddlewareTests(unittest.TestCase):
+    """Testing .compression.CompressionMiddleware."""
+
+    def call(self, headers, body=(b'x' * 2000,), accept='gzip, deflate',
+             status='200 OK', **kw):
+        from .compression import CompressionMiddleware
+
+        def app(environ, start_response):
+            start_response(status, list(headers))
+            return list(body)
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['headers'] = dict(headers)
+
+        environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': accept}
+        result = CompressionMiddleware(app, **kw)(environ, start_response)
+        return response['headers'], b''.join(result)
+
+    def test_gzip(self):
+        headers, body = self.call([('Content-Type', 'text/html'),
+                                   ('Content-Length', '2000'),
+                                   ('ETag', '"abc"')])
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', headers['Vary'])
+        self.assertEqual('W/"abc"', headers['ETag'])
+        self.assertNotIn('Content-Length', headers)
+        self.assertEqual(b'x' * 2000, zlib.decompress(body, 31))
+
+    def test_deflate_streamed(self):
+        headers, body = self.call(
+            [('Content-Type', 'application/json'), ('Vary', 'Cookie')],
+            body=[b'{', b'"a": 1', b'}'], accept='gzip;q=0, deflate')
+        self.assertEqual('deflate', headers['Content-Encoding'])
+        self.assertEqual('Cookie, Accept-Encoding', headers['Vary'])
+        self.assertEqual(b'{"a": 1}', zlib.decompress(body))
+
+    def test_not_compressed(self):
+        # Not accepted by the client:
+        headers, body = self.call([('Content-Type', 'text/html')],
+                                  accept='identity')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual('Accept-Encoding', headers['Vary'])
+        # Too small:
+        headers, body = self.call([('Content-Type', 'text/html'),
+                                   ('Content-Length', '10')], body=[b'x'])
+        self.assertNotIn('Content-Encoding', headers)
+        # Not an allowed content type:
+        headers, body = self.call([('Content-Type', 'image/png')])
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertNotIn('Vary', headers)
+        # Already compressed:
+        headers, body = self.call([('Content-Type', 'text/plain'),
+                                   ('Content-Encoding', 'br')])
+        self.assertEqual('br', headers['Content-Encoding'])
+        # Partial content:
+        headers, body = self.call([('Content-Type', 'text/plain')],
+                                  status='206 Partial Content')
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_lazy_start_response(self):
+        from .compression import CompressionMiddleware
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            yield b'lazy'
+
+        response = {}
+        result = CompressionMiddleware(app)(
+            {'HTTP_ACCEPT_ENCODING': 'gzip'},
+            lambda status, headers, exc_info=None: response.update(headers))
+        self.assertEqual(b'lazy', zlib.decompress(b''.join(result), 31))
+        self.assertEqual('gzip', response['Content-Encoding'])
+
+
+class RequestBodyMiddlewareTests(unittest.TestCase):
+    """Testing .requestbody.RequestBodyMiddleware."""
+
+    def call(self, environ, **kw):
+        from .requestbody import RequestBodyMiddleware
+        seen = {}
+
+        def app(environ, start_response):
+            seen['length'] = environ.get('CONTENT_LENGTH')
+            seen['body'] = environ['wsgi.input'].read()
+            start_response('200 OK', [])
+            return [b'ok']
+
+        status = []
+        result = RequestBodyMiddleware(app, **kw)(
+            environ, lambda s, h, e=None: status.append(s))
+        b''.join(result)
+        if hasattr(result, 'close'):
+            result.close()
+        return status[0], seen
+
+    def test_content_length_too_large(self):
+        status, seen = self.call(
+            {'CONTENT_LENGTH': '11', 'wsgi.input': io.BytesIO(b'x' * 11)},
+            max_size=10)
+        self.assertEqual('413 Request Entity Too Large', status)
+        self.assertEqual({}, seen)
+
+    def test_content_length_invalid(self):
+        for length in ('eleven', '-1'):
+            status, seen = self.call(
+                {'CONTENT_LENGTH': length, 'wsgi.input': io.BytesIO(b'x')},
+                max_size=10)
+            self.assertEqual('400 Bad Request', status)
+            self.assertEqual({}, seen)
+
+    def test_content_length_passed_through(self):
+        stream = io.BytesIO(b'x' * 10)
+        status, seen = self.call(
+            {'CONTENT_LENGTH': '10', 'wsgi.input': stream}, max_size=10)
+        self.assertEqual('200 OK', status)
+        self.assertEqual(b'x' * 10, seen['body'])
+
+    def test_chunked_is_spooled(self):
+        body = b'y' * 200000
+        status, seen = self.call(
+            {'HTTP_TRANSFER_ENCODING': 'chunked',
+             'wsgi.input': io.BytesIO(body)},
+            max_size=300000, spool_size=1000)
+        self.assertEqual('200 OK', status)
+        self.assertEqual('200000', seen['length'])
+        self.assertEqual(body, seen['body'])
+
+    def test_chunked_too_large(self):
+        status, seen = self.call(
+            {'HTTP_TRANSFER_ENCODING': 'chunked',
+             'wsgi.input': io.BytesIO(b'y' * 200000)},
+            max_size=100000)
+        self.assertEqual('413 Request Entity Too Large', status)
+        self.assertEqual({}, seen)
+
+
+class ResponseCacheMiddlewareTests(unittest.TestCase):
+    """Testing .cache.ResponseCacheMiddleware."""
+
+    def setUp(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        self.db = DB(MappingStorage())
+        self.addCleanup(self.db.close)
+        self.rendered = 0
+        self.headers = [('Content-Type', 'text/plain')]
+
+    def app(self, environ, start_response):
+        self.rendered += 1
+        start_response('200 OK', list(self.headers))
+        return [b'page %d' % self.rendered]
+
+    def get(self, cache, path='/', **environ):
+        environ.update(REQUEST_METHOD='GET', PATH_INFO=path)
+        result = cache(environ, lambda s, h, e=None: None)
+        body = b''.join(result)
+        if hasattr(result, 'close'):
+            result.close()
+        return body
+
+    def commit(self):
+        import transaction
+        conn = self.db.open()
+        conn.root()['counter'] = conn.root().get('counter', 0) + 1
+        transaction.commit()
+        conn.close()
+
+    def test_hits_and_invalidation(self):
+        from .cache import ResponseCacheMiddleware
+        cache = ResponseCacheMiddleware(self.app, db=self.db)
+        self.assertEqual(b'page 1', self.get(cache))
+        self.assertEqual(b'page 1', self.get(cache))
+        self.assertEqual(b'page 2', self.get(cache, '/other'))
+        self.commit()
+        self.assertEqual(b'page 3', self.get(cache))
+        self.assertEqual(
+            {'entries': 1, 'size': 28, 'hits': 1, 'misses': 3,
+             'evictions': 0, 'invalidations': 1}, cache.stats())
+
+    def test_not_cached(self):
+        from .cache import ResponseCacheMiddleware
+        cache = ResponseCacheMiddleware(self.app, db=self.db)
+        self.get(cache, HTTP_AUTHORIZATION='Basic xyz')
+        self.get(cache, HTTP_AUTHORIZATION='Basic xyz')
+        self.assertEqual(2, self.rendered)
+        self.headers.append(('Cache-Control', 'private'))
+        self.get(cache)
+        self.get(cache)
+        self.assertEqual(4, self.rendered)
+        self.assertEqual(0, cache.stats()['entries'])
+
+    def test_eviction(self):
+        from .cache import ResponseCacheMiddleware
+        cache = ResponseCacheMiddleware(self.app, db=self.db, max_size=60)
+        self.get(cache, '/a')
+        self.get(cache, '/b')
+        self.get(cache, '/a')
+        self.get(cache, '/c')
+        self.assertEqual(1, cache.stats()['evictions'])
+        # /b was the least recently used entry:
+        self.assertEqual(b'page 1', self.get(cache, '/a'))
+        self.assertEqual(b'page 4', self.get(cache, '/b'))
+
+    def test_vary(self):
+        from .cache import ResponseCacheMiddleware
+        cache = ResponseCacheMiddleware(self.app, db=self.db)
+        self.get(cache, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(b'page 2', self.get(cache))
+        self.assertEqual(
+            b'page 1', self.get(cache, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(
+            b'page 3', self.get(cache, HTTP_ACCEPT_LANGUAGE='de'))
+        self.assertEqual(
+            b'page 3', self.get(cache, HTTP_ACCEPT_LANGUAGE='de'))
+
+    def test_vary_header_of_response(self):
+        from .cache import ResponseCacheMiddleware
+        cache = ResponseCacheMiddleware(self.app, db=self.db)
+        self.headers.append(('Vary', 'Accept-Language, Accept-Encoding'))
+        self.get(cache)
+        self.assertEqual(b'page 1', self.get(cache))
+        # Responses varying on headers not in the key are not stored:
+        for vary in ('User-Agent', 'Accept-Language, X-Custom', '*'):
+            self.headers[-1] = ('Vary', vary)
+            self.get(cache, '/' + vary)
+            self.assertEqual(
+                b'page %d' % (self.rendered + 1),
+                self.get(cache, '/' + vary))
+
+
+class AdmissionControlMiddlewareTests(unittest.TestCase):
+    """Testing .admission.AdmissionControlMiddleware."""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.entered = threading.Semaphore(0)
+
+    def blocking_app(self, environ, start_response):
+        self.entered.release()
+        self.release.wait(10)
+        start_response('200 OK', [])
+        return [b'done']
+
+    def call(self, app, path='/'):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        b''.join(app({'PATH_INFO': path}, start_response))
+        return response
+
+    def test_sheds_load(self):
+        from .admission import AdmissionControlMiddleware
+        app = AdmissionControlMiddleware(
+            self.blocking_app, max_concurrent=1, max_queued=0,
+            retry_after=7, priority_paths=('/health',))
+        busy = threading.Thread(target=self.call, args=(app,))
+        busy.start()
+        self.assertTrue(self.entered.acquire(timeout=10))
+
+        response = self.call(app)
+        self.assertEqual('503 Service Unavailable', response['status'])
+        self.assertEqual('7', response['headers']['Retry-After'])
+        self.assertEqual(1, app.rejected)
+
+        # Priority paths are let through:
+        self.release.set()
+        self.assertEqual('200 OK', self.call(app, '/health')['status'])
+        busy.join()
+        self.assertEqual('200 OK', self.call(app)['status'])
+
+    def test_queue_timeout(self):
+        from .admission import AdmissionControlMiddleware
+        app = AdmissionControlMiddleware(
+            self.blocking_app, max_concurrent=1, max_queued=1, timeout=0.01)
+        busy = threading.Thread(target=self.call, args=(app,))
+        busy.start()
+        self.assertTrue(self.entered.acquire(timeout=10))
+        self.assertEqual(
+            '503 Service Unavailable', self.call(app)['status'])
+        self.release.set()
+        busy.join()
+
+    def test_max_concurrent_from_database(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+
+        from .admission import AdmissionControlMiddleware
+        db = DB(MappingStorage(), pool_size=4)
+        self.addCleanup(db.close)
+        app = AdmissionControlMiddleware(
+            zope.app.wsgi.WSGIPublisherApplication(db))
+        self.assertEqual(4, app.max_concurrent)
+        self.assertEqual(4, app.max_queued)
+
+
+class WatchdogTests(unittest.TestCase):
+    """Testing .watchdog.Watchdog."""
+
+    def test_logs_stack_of_slow_requests(self):
+        from .watchdog import Watchdog
+        from .watchdog import logger
+
+        class Principal:
+            id = 'zope.user'
+
+        class Request:
+            principal = Principal()
+
+        # The checks are done by the test, not by the background thread.
+        watchdog = Watchdog(threshold=0, interval=60)
+        self.addCleanup(watchdog.stop)
+        release = threading.Event()
+        entered = threading.Event()
+
+        def slow_request():
+            watchdog.enter(Request(), '/slow')
+            entered.set()
+            release.wait(10)
+            watchdog.leave()
+
+        thread = threading.Thread(target=slow_request)
+        thread.start()
+        entered.wait(10)
+        try:
+            [info] = watchdog.inflight()
+            self.assertEqual('/slow', info['path'])
+            self.assertEqual('zope.user', info['principal'])
+            with self.assertLogs('zope.app.wsgi.watchdog') as logs:
+                watchdog.check()
+                # Requests are reported only once.
+                watchdog.check()
+                logger.warning('end')
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(2, len(logs.output))
+        self.assertIn('Request for /slow by zope.user', logs.output[0])
+        self.assertIn('in slow_request', logs.output[0])
+        self.assertEqual([], watchdog.inflight())
+
+
+class AccessLogMiddlewareTests(unittest.TestCase):
+    """Testing .accesslog.AccessLogMiddleware."""
+
+    def test_writes_records(self):
+        import json
+
+        from .accesslog import AccessLogMiddleware
+
+        def app(environ, start_response):
+            environ['wsgi.logging_info'] = 'zope.mgr'
+            return simple_app(environ, start_response)
+
+        stream = io.StringIO()
+        middleware = AccessLogMiddleware(app, stream)
+        environ = {'PATH_INFO': '/a', 'QUERY_STRING': 'b=c',
+                   'REQUEST_METHOD': 'GET', 'REMOTE_ADDR': '127.0.0.1'}
+        result = middleware(environ, lambda s, h, e=None: None)
+        self.assertEqual(b'Hello World', b''.join(result))
+        result.close()
+        middleware.writer.stop()
+
+        [line] = stream.getvalue().splitlines()
+        record = json.loads(line)
+        self.assertGreaterEqual(record.pop('duration'), 0)
+        self.assertIsInstance(record.pop('time'), float)
+        self.assertEqual(
+            {'remote_addr': '127.0.0.1', 'method': 'GET', 'path': '/a',
+             'query': 'b=c', 'status': 200, 'bytes': 11,
+             'principal': 'zope.mgr'}, record)
+
+    def test_drops_records_on_overflow(self):
+        from .accesslog import AccessLogWriter
+
+        class BlockingStream(io.StringIO):
+            def write(self, data):
+                writing.set()
+                release.wait(10)
+                return super().write(data)
+
+        writing = threading.Event()
+        release = threading.Event()
+        stream = BlockingStream()
+        writer = AccessLogWriter(stream, max_queued=2, batch_size=10)
+        self.addCleanup(writer.stop, 10)
+        writer.put({'n': 0})
+        # Wait until the writer thread blocks writing the first record.
+        writing.wait(10)
+        for n in range(1, 5):
+            writer.put({'n': n})
+        self.assertEqual(2, writer.dropped)
+        release.set()
+        writer.stop(10)
+        self.assertEqual(3, writer.written)
+        self.assertEqual(3, len(stream.getvalue().splitlines()))
+
+    def test_survives_write_errors(self):
+        from .accesslog import AccessLogWriter
+
+        class FailingStream(io.StringIO):
+            failures = 1
+
+            def write(self, data):
+                if self.failures:
+                    self.failures -= 1
+                    raise OSError('No space left on device')
+                return super().write(data)
+
+        stream = FailingStream()
+        writer = AccessLogWriter(stream, batch_size=1)
+        with self.assertLogs('zope.app.wsgi.accesslog', 'ERROR') as logs:
+            writer.put({'n': 0})
+            writer.put({'n': 1})
+            writer.stop(10)
+        self.assertEqual(1, len(logs.records))
+        self.assertEqual(1, writer.dropped)
+        self.assertEqual(1, writer.written)
+        self.assertEqual('{"n":1}\n', stream.getvalue())
+
+    def test_stop_does_not_block_on_full_queue(self):
+        from .accesslog import AccessLogWriter
+
+        class BlockingStream(io.StringIO):
+            def write(self, data):
+                writing.set()
+                release.wait(10)
+                return super().write(data)
+
+        writing = threading.Event()
+        release = threading.Event()
+        writer = AccessLogWriter(BlockingStream(), max_queued=1)
+        self.addCleanup(release.set)
+        writer.put({'n': 0})
+        thread = writer._thread
+        self.addCleanup(thread.join, 10)
+        writing.wait(10)
+        writer.put({'n': 1})
+        # The queue is full and the thread cannot take the stop marker:
+        writer.stop(0.1)
+        self.assertTrue(thread.is_alive())
+        # Once the stream is writable again, the thread can be stopped:
+        release.set()
+        writer.stop(10)
+        self.assertFalse(thread.is_alive())
+
+    def test_file_wrapper_is_not_wrapped(self):
+        import json
+
+        from .accesslog import AccessLogMiddleware
+
+        class FileWrapper:
+            def __init__(self, f):
+                self.f = f
+
+        def file_app(environ, start_response):
+            start_response('200 OK', [('Content-Length', '3')])
+            return environ['wsgi.file_wrapper'](io.BytesIO(b'abc'))
+
+        stream = io.StringIO()
+        middleware = AccessLogMiddleware(file_app, stream)
+        environ = {'PATH_INFO': '/', 'wsgi.file_wrapper': FileWrapper}
+        result = middleware(environ, lambda s, h, e=None: None)
+        self.assertIsInstance(result, FileWrapper)
+        middleware.writer.stop(10)
+        record = json.loads(stream.getvalue())
+        self.assertEqual((200, 3), (record['status'], record['bytes']))
+
+
+class ReadOnlyRoutingTests(unittest.TestCase):
+    """Testing read-only routing of .WSGIPublisherApplication."""
+
+    def test_routes_by_rule(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+
+        from . import WSGIPublisherApplication
+        from .routing import ReadOnlyRule
+
+        class ReadOnlyStorage(MappingStorage):
+            def isReadOnly(self):
+                return True
+
+        used = []
+
+        def factory(db):
+            def createRequest(input_stream, env):
+                used.append(db)
+                raise RuntimeError
+            return createRequest
+
+        db = DB(MappingStorage())
+        readonly_db = DB(ReadOnlyStorage())
+        self.addCleanup(db.close)
+        self.addCleanup(readonly_db.close)
+        app = WSGIPublisherApplication(
+            db, factory, readonly_db=readonly_db,
+            readonly_rule=ReadOnlyRule(writable_paths=['/login']))
+        for method, path, expected in [
+                ('GET', '/index', readonly_db),
+                ('head', '/index', readonly_db),
+                ('POST', '/index', db),
+                ('GET', '/login', db)]:
+            with self.assertRaises(RuntimeError):
+                app({'REQUEST_METHOD': method, 'PATH_INFO': path,
+                     'wsgi.input': io.BytesIO()}, None)
+            self.assertIs(expected, used.pop())
+
+        with self.assertRaises(ValueError):
+            WSGIPublisherApplication(db, factory, readonly_db=db)
+
+
+class ReadOnlyPublishingTests(unittest.TestCase):
+    """Testing publishing using the read-only database."""
+
+    layer = wsgiapp_layer
+
+    def test_publishes_from_readonly_database(self):
+        from ZODB.DB import DB
+        from ZODB.FileStorage import FileStorage
+        from ZODB.POSException import ReadOnlyError
+        from zope.processlifetime import DatabaseOpened
+        from zope.publisher.interfaces.browser import IBrowserPublisher
+        from zope.publisher.interfaces.browser import IBrowserRequest
+        from zope.security import checker
+        from zope.security.proxy import removeSecurityProxy
+
+        from . import WSGIPublisherApplication
+        from .testlayer import http
+
+        @zope.interface.implementer(IBrowserPublisher)
+        class DatabaseView:
+            def __init__(self, context, request):
+                self.context = removeSecurityProxy(context)
+
+            def browserDefault(self, request):
+                return self, ()
+
+            def __call__(self):
+                return self.context._p_jar.db().database_name
+
+        class WriteView(DatabaseView):
+            def __call__(self):
+                self.context.marker = True
+                return 'written'
+
+        for view, name in [(DatabaseView, 'database.html'),
+                           (WriteView, 'write.html')]:
+            zope.component.provideAdapter(
+                view, (zope.interface.Interface, IBrowserRequest),
+                zope.interface.Interface, name=name)
+            checker.defineChecker(
+                view, checker.NamesChecker(['browserDefault', '__call__']))
+            self.addCleanup(checker.undefineChecker, view)
+            self.addCleanup(
+                zope.component.getGlobalSiteManager().unregisterAdapter,
+                view, (zope.interface.Interface, IBrowserRequest),
+                zope.interface.Interface, name=name)
+
+        # Create a replica with a root folder:
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'Data.fs')
+        db = DB(FileStorage(path))
+        zope.event.notify(DatabaseOpened(db))
+        db.close()
+        readonly_db = DB(FileStorage(path, read_only=True),
+                         database_name='replica')
+        self.addCleanup(readonly_db.close)
+
+        app = WSGIPublisherApplication(
+            wsgiapp_layer.db, readonly_db=readonly_db)
+        response = http(app, b'GET /database.html HTTP/1.1')
+        self.assertEqual(200, response.getStatus())
+        self.assertEqual(b'replica', response.getBody())
+        response = http(app, b'POST /database.html HTTP/1.1')
+        self.assertEqual(wsgiapp_layer.db.database_name.encode(),
+                         response.getBody())
+        # Writing requests wrongly routed to the replica fail loudly:
+        with self.assertRaises(ReadOnlyError):
+            http(app, b'GET /write.html HTTP/1.1', handle_errors=False)
+
+
+class CacheWarmerTests(unittest.TestCase):
+    """Testing .warmup."""
+
+    def setUp(self):
+        import transaction
+        from persistent.mapping import PersistentMapping
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        self.db = DB(MappingStorage(), pool_size=2)
+        self.addCleanup(self.db.close)
+        connection = self.db.open()
+        root = connection.root()
+        for name in 'abc':
+            root[name] = PersistentMapping()
+        transaction.commit()
+        self.oids = {name: root[name]._p_oid for name in 'abc'}
+        connection.close()
+        self.path = os.path.join(tempfile.mkdtemp(), 'hot.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+
+    def test_save_and_warm_up(self):
+        from .warmup import getHotOIDs
+        from .warmup import loadHotOIDs
+        from .warmup import saveHotOIDs
+        from .warmup import warmUp
+        self.db.cacheMinimize()
+        first, second = self.db.open(), self.db.open()
+        first_root, second_root = first.root(), second.root()
+        first_root['a']._p_activate()
+        first_root['b']._p_activate()
+        second_root['a']._p_activate()
+        first.close()
+        second.close()
+        # 'a' and the root are loaded in both connections, 'c' in none.
+        hot = getHotOIDs(self.db)
+        self.assertEqual({self.oids['a'], first_root._p_oid}, set(hot[:2]))
+        self.assertEqual([self.oids['b']], hot[2:])
+        self.assertEqual(hot[:1], getHotOIDs(self.db, 1))
+        self.assertEqual(3, saveHotOIDs(self.db, self.path))
+        # Empty caches do not overwrite the file.
+        self.db.cacheMinimize()
+        self.assertEqual(0, saveHotOIDs(self.db, self.path))
+
+        oids = loadHotOIDs(self.path)
+        self.assertEqual(hot, oids)
+        self.assertEqual(6, warmUp(self.db, oids))
+        for connection in self.db.pool:
+            cache = connection._cache
+            self.assertIsNotNone(cache.get(self.oids['a'])._p_changed)
+            self.assertIsNotNone(cache.get(self.oids['b'])._p_changed)
+            self.assertIsNone(cache.get(self.oids['c'])._p_changed)
+
+    def test_missing_objects_and_files(self):
+        from .warmup import loadHotOIDs
+        from .warmup import warmUp
+        self.assertEqual([], loadHotOIDs(self.path))
+        with open(self.path, 'w') as f:
+            f.write('garbage')
+        self.assertEqual([], loadHotOIDs(self.path))
+        self.assertEqual(
+            1, warmUp(self.db, [b'\xff' * 8, self.oids['c']], 1))
+
+    def test_CacheWarmer(self):
+        from .warmup import CacheWarmer
+        from .warmup import loadHotOIDs
+        connection = self.db.open()
+        connection.root()['c']._p_activate()
+        connection.close()
+        warmer = CacheWarmer(self.db, self.path, interval=None)
+        warmer.start()
+        warmer.stop()
+        oids = loadHotOIDs(self.path)
+        self.assertIn(self.oids['c'], oids)
+
+        self.db.cacheMinimize()
+        warmer = CacheWarmer(self.db, self.path, connections=1)
+        self.assertEqual(len(oids), warmer.warmUp())
+
+
+class RequestProfilerTests(unittest.TestCase):
+    """Testing .profiling.RequestProfiler."""
+
+    def test_signed_header(self):
+        import time
+
+        from .profiling import RequestProfiler
+        from .profiling import sign
+        profiler = RequestProfiler('/tmp', secret='s3cret')
+        expires = time.time() + 60
+        environ = {'PATH_INFO': '/slow',
+                   'HTTP_X_ZOPE_PROFILE': sign('s3cret', '/slow', expires)}
+        self.assertTrue(profiler.isAuthorized(environ))
+        # Signed for another path:
+        environ['PATH_INFO'] = '/other'
+        self.assertFalse(profiler.isAuthorized(environ))
+        # Expired:
+        environ = {'PATH_INFO': '/slow',
+                   'HTTP_X_ZOPE_PROFILE': sign('s3cret', '/slow', 1)}
+        self.assertFalse(profiler.isAuthorized(environ))
+        # Signed with the wrong secret:
+        environ = {'PATH_INFO': '/slow',
+                   'HTTP_X_ZOPE_PROFILE': sign('guess', '/slow', expires)}
+        self.assertFalse(profiler.isAuthorized(environ))
+        # Headers are ignored without a secret:
+        environ = {'PATH_INFO': '/slow',
+                   'HTTP_X_ZOPE_PROFILE': sign('s3cret', '/slow', expires)}
+        self.assertFalse(RequestProfiler('/tmp').isAuthorized(environ))
+
+    def test_rate_limit(self):
+        from .profiling import RequestProfiler
+        profiler = RequestProfiler('/tmp', min_interval=3600)
+        environ = {'zope.app.wsgi.profile': True}
+        self.assertFalse(profiler.isRequested({}))
+        self.assertTrue(profiler.isRequested(environ))
+        self.assertFalse(profiler.isRequested(environ))
+
+    def test_one_at_a_time(self):
+        from .profiling import RequestProfiler
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        profiler = RequestProfiler(directory, min_interval=0)
+        environ = {'zope.app.wsgi.profile': True}
+        overlapping = []
+
+        def func():
+            overlapping.append(profiler.isRequested(environ))
+            return 42
+
+        self.assertTrue(profiler.isRequested(environ))
+        self.assertEqual(42, profiler.runcall(environ, func))
+        self.assertEqual([False], overlapping)
+        self.assertTrue(profiler.isRequested(environ))
+
+    def test_write_errors_are_logged(self):
+        from .profiling import RequestProfiler
+        profiler = RequestProfiler(
+            os.path.join(tempfile.gettempdir(), 'no', 'such', 'directory'))
+        environ = {'zope.app.wsgi.profile': True, 'PATH_INFO': '/a'}
+        self.assertTrue(profiler.isRequested(environ))
+        with self.assertLogs('zope.app.wsgi.profiling', 'ERROR'):
+            self.assertEqual(42, profiler.runcall(environ, lambda: 42))
+
+
+class StartupProfileTests(unittest.TestCase):
+    """Testing .startup.StartupProfile."""
+
+    def setUp(self):
+        import types
+
+        from . import startup
+
+        class Grouping:
+            def __init__(self, context):
+                pass
+
+            def before(self):
+                pass
+
+        class Pages(Grouping):
+            def before(self):
+                pass
+
+        def register(context):
+            pass
+
+        def view(context):
+            pass
+
+        self.functions = {
+            'init': Grouping.__init__, 'grouping': Grouping.before,
+            'pages': Pages.before, 'register': register, 'view': view}
+        context = types.SimpleNamespace(_docRegistry=[
+            (('', 'module'), None, None, Grouping, None, None),
+            (('', 'pages'), None, None, Pages, None, None),
+            (('', 'a'), None, None, register, None, None),
+            (('', 'b'), None, None, register, None, None),
+            (('zope', 'view'), None, None, view, None, None),
+        ])
+        patcher = unittest.mock.patch.object(
+            startup.appsetup, 'getConfigContext', return_value=context)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def key(self, name):
+        code = self.functions[name].__code__
+        return code.co_filename, code.co_firstlineno, code.co_name
+
+    def test_getHandlers(self):
+        from .startup import _getHandlers
+
+        # The `__init__` inherited by `Pages` and the function handling
+        # two directives cannot be attributed to a single directive:
+        self.assertEqual(
+            {self.key('grouping'): 'module', self.key('pages'): 'pages',
+             self.key('view'): 'zope view'},
+            _getHandlers())
+
+    def test_analyze(self):
+        from .startup import StartupProfile
+        from .startup import _getHandlers
+
+        # Entries are (primitive calls, calls, time, cumulative time,
+        # callers):
+        stats = {
+            self.key('view'): (2, 2, 0.1, 0.5, {}),
+            self.key('pages'): (1, 1, 0.1, 0.25, {}),
+            self.key('init'): (3, 3, 0.1, 0.75, {}),
+            (__file__, 1, '<module>'): (1, 1, 0.0, 1.0, {}),
+        }
+        profile = StartupProfile()
+        profile._analyze(stats, _getHandlers())
+        self.assertEqual(
+            [{'directive': 'zope view', 'handler': '%s:view' % __name__,
+              'calls': 2, 'seconds': 0.5},
+             {'directive': 'pages', 'handler': '%s:before' % __name__,
+              'calls': 1, 'seconds': 0.25}],
+            profile.directives)
+        self.assertEqual([{'module': __name__, 'seconds': 1.0}],
+                         profile.imports)
+
+
+ZOPE_CONF = """
+site-definition %s
+
+<zodb>
+  <mappingstorage />
+</zodb>
+
+<eventlog>
+  <logfile>
+    path STDERR
+  </logfile>
+</eventlog>
+"""
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class PreforkServerTests(unittest.TestCase):
+    """Testing .prefork.PreforkServer and .prefork.ReloadingServer."""
+
+    def test_serves_from_workers(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        zopeconf = os.path.join(temp_dir, 'zope.conf')
+        with open(zopeconf, 'w') as f:
+            f.write(ZOPE_CONF % os.path.join(
+                os.path.dirname(__file__), 'ftesting.zcml'))
+        script = textwrap.dedent("""
+            import sys
+            from zope.app.wsgi.prefork import PreforkServer
+            server = PreforkServer(sys.argv[1], port=0, workers=1,
+                                   warmup_file=sys.argv[2])
+            print(server.bind()[1], flush=True)
+            server.run()
+        """)
+        warmup_file = os.path.join(temp_dir, 'hot.json')
+        process = subprocess.Popen(
+            [sys.executable, '-c', script, zopeconf, warmup_file],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.addCleanup(process.stdout.close)
+        port = int(process.stdout.readline())
+        try:
+            url = 'http://127.0.0.1:%d/no-such-page' % port
+            try:
+                status = urllib.request.urlopen(url, timeout=30).status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            # The response comes from the publisher.
+            self.assertEqual(404, status)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(0, process.wait(timeout=30))
+        # The workers saved the objects in their caches when stopping:
+        self.assertTrue(os.path.exists(warmup_file))
+
+    def test_refuses_unshareable_storages(self):
+        from .prefork import PreforkServer
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        zopeconf = os.path.join(temp_dir, 'zope.conf')
+        with open(zopeconf, 'w') as f:
+            f.write(ZOPE_CONF % os.path.join(
+                os.path.dirname(__file__), 'ftesting.zcml'))
+        # Each worker would get its own MappingStorage:
+        server = PreforkServer(zopeconf, port=0, workers=2)
+        with self.assertRaisesRegex(ValueError, 'cannot be shared'):
+            server.run()
+        # Nothing was started:
+        self.assertIsNone(server.socket)
+        self.assertEqual({}, server.children)
+
+    def test_reload_refuses_unshareable_storages(self):
+        from .prefork import ReloadingServer
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        zopeconf = os.path.join(temp_dir, 'zope.conf')
+        with open(zopeconf, 'w') as f:
+            f.write(ZOPE_CONF % os.path.join(
+                os.path.dirname(__file__), 'ftesting.zcml'))
+        # The new process could not open a FileStorage while the old one
+        # has it open, even with a single worker:
+        server = ReloadingServer(zopeconf, port=0, workers=1)
+        with self.assertRaisesRegex(ValueError, 'cannot be shared'):
+            server.run()
+        self.assertIsNone(server.socket)
+
+    def test_stops_after_startup_failures(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        zopeconf = os.path.join(temp_dir, 'zope.conf')
+        # The workers cannot open a directory as FileStorage:
+        data_fs = os.path.join(temp_dir, 'Data.fs')
+        os.mkdir(data_fs)
+        with open(zopeconf, 'w') as f:
+            f.write(ZOPE_CONF.replace(
+                '<mappingstorage />',
+                '<filestorage>\n path %s\n</filestorage>' % data_fs)
+                % os.path.join(os.path.dirname(__file__), 'ftesting.zcml'))
+        script = textwrap.dedent("""
+            import sys
+            from zope.app.wsgi import prefork
+            prefork.MIN_WORKER_LIFETIME = 0.1
+            prefork.PreforkServer(sys.argv[1], port=0, workers=1).run()
+        """)
+        process = subprocess.run(
+            [sys.executable, '-c', script, zopeconf],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, timeout=60)
+        self.assertNotEqual(0, process.returncode)
+        self.assertIn('5 workers in a row failed to start', process.stderr)
+        self.assertIn('The workers could not be started.', process.stderr)
+
+    def test_reload(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        zopeconf = os.path.join(temp_dir, 'zope.conf')
+        config = ZOPE_CONF % os.path.join(
+            os.path.dirname(__file__), 'ftesting.zcml')
+        with open(zopeconf, 'w') as f:
+            f.write(config)
+        script = textwrap.dedent("""
+            import logging, sys
+            from zope.app.wsgi import prefork
+            logging.basicConfig(level=logging.INFO)
+            # The processes do not share the MappingStorage, which does
+            # not matter for the pages requested here.
+            prefork.checkShareableDatabases = lambda options: None
+            server = prefork.ReloadingServer(sys.argv[1], port=0, workers=1)
+            print(server.bind()[1], flush=True)
+            server.run()
+        """)
+        process = subprocess.Popen(
+            [sys.executable, '-c', script, zopeconf],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        self.addCleanup(process.stdout.close)
+        self.addCleanup(process.stderr.close)
+        port = int(process.stdout.readline())
+
+        def get():
+            url = 'http://127.0.0.1:%d/no-such-page' % port
+            try:
+                return urllib.request.urlopen(url, timeout=30).status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        def reload(expected):
+            process.send_signal(signal.SIGHUP)
+            for line in process.stderr:
+                if expected in line:
+                    return
+
+        try:
+            self.assertEqual(404, get())
+            # A broken configuration leaves the old process serving:
+            with open(zopeconf, 'w') as f:
+                f.write('<zodb>')
+            reload('Reloading the configuration failed')
+            self.assertEqual(404, get())
+            with open(zopeconf, 'w') as f:
+                f.write(config)
+            reload('Reloaded the configuration')
+            self.assertEqual(404, get())
+        finally:
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(0, process.wait(timeout=30))
+
+
+class BrowserLayerTests(unittest.TestCase):
+    """Testing .testlayer.BrowserLayer."""
+
+    layer = wsgiapp_layer
+
+    def test_commits_only_changes(self):
+        import transaction
+        from transaction._transaction import Transaction
+
+        from .testlayer import http
+        app = wsgiapp_layer.make_wsgi_app()
+        with unittest.mock.patch.object(
+                Transaction, 'commit', autospec=True,
+                side_effect=Transaction.commit) as commit:
+            # Only the publisher commits:
+            http(app, b'GET /no-such-page HTTP/1.1')
+            published = commit.call_count
+            # The middleware commits the change before publishing:
+            wsgiapp_layer.getRootFolder().marker = True
+            http(app, b'GET /no-such-page HTTP/1.1')
+            self.assertEqual(2 * published + 1, commit.call_count)
+        transaction.abort()
+        self.assertTrue(wsgiapp_layer.getRootFolder().marker)
+
+    def test_commits_without_private_resources(self):
+        from .testlayer import TransactionMiddleware
+
+        # Should ``transaction`` drop its private ``_resources``:
+        txn = unittest.mock.Mock(spec=['commit'])
+        root = unittest.mock.Mock()
+        middleware = TransactionMiddleware(
+            lambda: root, lambda environ, start_response: [b''])
+        with unittest.mock.patch('transaction.get', return_value=txn):
+            list(middleware({}, None))
+        txn.commit.assert_called_once_with()
+
+    def test_http_same_as_webob(self):
+        from webtest import TestRequest
+
+        from .testlayer import FakeResponse
+        from .testlayer import http
+        app = wsgiapp_layer.make_wsgi_app()
+        for string in [
+                b'GET /no-such-page?a=1 HTTP/1.0',
+                b'GET http://example.com:8080/%7Ex HTTP/1.1\n'
+                b'Accept: text/html\nAccept: text/plain\n\n',
+                b'POST /no-such-page HTTP/1.1\nContent-Type: text/plain\n'
+                b'Content-Length: 4\n\nbodytrailing']:
+            request = TestRequest.from_file(io.BytesIO(string))
+            request.environ['wsgi.handleErrors'] = True
+            expected = FakeResponse(request.get_response(app), request)
+            response = http(app, string)
+            self.assertEqual(bytes(expected), bytes(response))
+            self.assertEqual(expected.getHeaders(), response.getHeaders())
+            self.assertEqual(expected.getHeader('content-type'),
+                             response.getHeader('Content-Type'))
+            self.assertEqual(expected.request.environ['wsgi.input'].read(),
+                             response.request.environ['wsgi.input'].read())
+            # The webob API is still available:
+            self.assertEqual(expected.response.content_type,
+                             response.response.content_type)
+            self.assertEqual(expected.request.path_info,
+                             response.request.path_info)
+
+    def test_http_body_same_as_webob(self):
+        from webtest import TestRequest
+
+        from .testlayer import FakeResponse
+        from .testlayer import http
+        closed = []
+
+        class Result:
+            def __init__(self, chunks):
+                self.chunks = chunks
+
+            def __iter__(self):
+                return iter(self.chunks)
+
+            def close(self):
+                closed.append(True)
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Result([b'Hello', b' World'])
+
+        string = b'GET / HTTP/1.1'
+        request = TestRequest.from_file(io.BytesIO(string))
+        expected = FakeResponse(request.get_response(app), request)
+        response = http(app, string)
+        self.assertEqual(expected.getBody(), response.getBody())
+        self.assertEqual(expected.getHeaders(), response.getHeaders())
+        self.assertIn(('Content-Length', '11'), response.getHeaders())
+        self.assertEqual(bytes(expected), bytes(response))
+        self.assertEqual([True, True], closed)
+
+        def wrong_length(environ, start_response):
+            start_response('200 OK', [('Content-Length', '3')])
+            return Result([b'Hello'])
+
+        with self.assertRaises(AssertionError):
+            http(wrong_length, string).getBody()
+
+    def test_http_webob_api_before_body(self):
+        from zope.security import checker
+
+        from . import WSGIPublisherApplication
+        from .testing import FileView
+        from .testlayer import http
+        zope.component.provideAdapter(FileView, name='file.html')
+        checker.defineChecker(
+            FileView, checker.NamesChecker(['browserDefault', '__call__']))
+        self.addCleanup(checker.undefineChecker, FileView)
+        self.addCleanup(
+            zope.component.getGlobalSiteManager().unregisterAdapter,
+            FileView, name='file.html')
+        # Without the middleware of `make_wsgi_app` the file result is
+        # passed through as it is:
+        app = WSGIPublisherApplication(wsgiapp_layer.db)
+        response = http(app, b'GET /file.html HTTP/1.1')
+        self.assertEqual('Hello\nWorld!\n', response.response.text)
+        self.assertEqual(b'Hello\nWorld!\n', response.getBody())
+        self.assertTrue(bytes(response).endswith(b'\n\nHello\nWorld!\n'))
+
+    def test_xmlrpc(self):
+        import xmlrpc.client
+
+        from zope.publisher.interfaces.xmlrpc import IXMLRPCRequest
+        from zope.security import checker
+
+        from .testlayer import XMLRPCServerProxy
+        from .testlayer import XMLRPCTestTransport
+
+        class Calculator:
+            def __init__(self, context, request):
+                pass
+
+            def __call__(self, a, b):
+                return a / b
+
+        zope.component.provideAdapter(
+            Calculator, (zope.interface.Interface, IXMLRPCRequest),
+            zope.interface.Interface, name='divide')
+        checker.defineChecker(Calculator, checker.NamesChecker(['__call__']))
+        self.addCleanup(checker.undefineChecker, Calculator)
+
+        proxy = XMLRPCServerProxy('http://localhost/', wsgi_app=wsgiapp_layer)
+        self.assertEqual(2.0, proxy.divide(6, 3))
+        with self.assertRaises(xmlrpc.client.Fault):
+            proxy.divide(1, 0)
+
+        closed = []
+
+        class Body(list):
+            def close(self):
+                closed.append(self)
+
+        def not_found(environ, start_response):
+            start_response('404 Not Found', [])
+            return Body()
+
+        with self.assertRaises(xmlrpc.client.ProtocolError) as cm:
+            XMLRPCServerProxy('http://localhost/',
+                              wsgi_app=not_found).divide(6, 3)
+        self.assertEqual(404, cm.exception.errcode)
+        # The body is closed on errors:
+        self.assertEqual(1, len(closed))
+
+        def succeeding(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/xml')])
+            return Body([xmlrpc.client.dumps((2.0,), methodresponse=True)
+                         .encode('utf-8')])
+
+        # And after reading it:
+        self.assertEqual(2.0, XMLRPCServerProxy(
+            'http://localhost/', wsgi_app=succeeding).divide(6, 3))
+        self.assertEqual(2, len(closed))
+
+        # The arguments of `xmlrpc.client.Transport` can still be passed
+        # positionally:
+        transport = XMLRPCTestTransport(True)
+        self.assertTrue(transport._use_datetime)
+        self.assertIsNone(transport.wsgi_app)
+
+        multicall = xmlrpc.client.MultiCall(proxy)
+        multicall.divide(6, 3)
+        multicall.divide(1, 0)
+        multicall.divide(1, 4)
+        results = multicall()
+        self.assertEqual([[2.0], {'faultCode': -1,
+                                  'faultString': results.results[1][
+                                      'faultString']},
+                          [0.25]], results.results)
+        self.assertIn('ZeroDivisionError', results.results[1]['faultString'])
+
+    def test_snapshot(self):
+        import transaction
+        import ZODB.interfaces
+
+        from .testlayer import http
+        app = wsgiapp_layer.make_wsgi_app()
+        db = wsgiapp_layer.db
+        wsgiapp_layer.getRootFolder().marker = 'before'
+        with wsgiapp_layer.snapshot():
+            self.assertIsNot(db, wsgiapp_layer.db)
+            self.assertIs(wsgiapp_layer.db, zope.component.getUtility(
+                ZODB.interfaces.IDatabase, 'main'))
+            root = wsgiapp_layer.getRootFolder()
+            self.assertEqual('before', root.marker)
+            root.marker = 'inside'
+            transaction.commit()
+            response = http(app, b'GET /no-such-page HTTP/1.1')
+            self.assertEqual(404, response.getStatus())
+            self.assertIs(wsgiapp_layer.db, wsgiapp_layer._application.db)
+        self.assertIs(db, wsgiapp_layer.db)
+        self.assertIs(db, wsgiapp_layer._application.db)
+        self.assertEqual('before', wsgiapp_layer.getRootFolder().marker)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class ParallelTestsTests(unittest.TestCase):
+    """Testing .testlayer.ParallelTests."""
+
+    def test_reports_results_of_workers(self):
+        import contextlib
+
+        from .testlayer import ParallelTests
+        from .testlayer import WorkerFailure
+
+        class Tests(unittest.TestCase):
+            def test_fail(self):
+                self.fail('failed in %d' % os.getpid())
+
+            def test_error(self):
+                raise ValueError
+
+            def test_skip(self):
+                self.skipTest('skipped')
+
+            def test_output(self):
+                print('output')
+
+            @unittest.expectedFailure
+            def test_expected_failure(self):
+                self.fail('expected')
+
+            @unittest.expectedFailure
+            def test_unexpected_success(self):
+                pass
+
+        # With a single worker the tests run in this process:
+        for workers, in_worker in [(2, True), (1, False)]:
+            tests = ParallelTests(
+                unittest.defaultTestLoader.loadTestsFromTestCase(Tests),
+                workers=workers)
+            self.assertEqual(6, tests.countTestCases())
+            result = unittest.TestResult()
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                tests.run(result)
+            self.assertEqual('output\n', output.getvalue())
+            [(test, text)] = result.failures
+            self.assertEqual('test_fail', test._testMethodName)
+            self.assertIn(WorkerFailure.__name__, text)
+            self.assertIn('AssertionError: failed in', text)
+            self.assertEqual(
+                in_worker, 'failed in %d' % os.getpid() not in text)
+            [(test, text)] = result.errors
+            self.assertIn('ValueError', text)
+            [(test, reason)] = result.skipped
+            self.assertIn('skipped', reason)
+            [(test, text)] = result.expectedFailures
+            self.assertIn('AssertionError: expected', text)
+            [test] = result.unexpectedSuccesses
+            self.assertEqual('test_unexpected_success', test._testMethodName)
+            self.assertFalse(result.wasSuccessful())
+
+    def test_zope_testrunner(self):
+        import contextlib
+
+        from zope.testrunner.runner import Runner
+
+        from .testlayer import ParallelTests
+
+        class Tests(unittest.TestCase):
+            def test_pass(self):
+                pass
+
+            def test_fail(self):
+                self.fail('failed')
+
+        for workers in (2, 1):
+            suite = unittest.TestSuite([ParallelTests(
+                unittest.defaultTestLoader.loadTestsFromTestCase(Tests),
+                workers=workers)])
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                runner = Runner(args=['test'], found_suites=[suite])
+                runner.run()
+            self.assertTrue(runner.failed)
+            self.assertIn('Failure in test test_fail', output.getvalue())
+            self.assertIn('Ran 2 tests with 1 failures', output.getvalue())
+
+
+def parallelBrowserTests():
+    """Tests of `wsgiapp_layer` run by `ParallelTests`."""
+    from .testlayer import ParallelTests
+    from .testlayer import http
+
+    class BrowserTests(unittest.TestCase):
+
+        def test_1(self):
+            self.check()
+
+        def test_2(self):
+            self.check()
+
+        def test_3(self):
+            self.check()
+
+        def check(self):
+            # Every test gets a fresh database:
+            root = wsgiapp_layer.getRootFolder()
+            self.assertFalse(hasattr(root, 'marker'))
+            root.marker = True
+            response = http(wsgiapp_layer.make_wsgi_app(),
+                            b'GET /no-such-page HTTP/1.1')
+            self.assertEqual(404, response.getStatus())
+
+    return ParallelTests(
+        unittest.defaultTestLoader.loadTestsFromTestCase(BrowserTests),
+        workers=2, layer=wsgiapp_layer)
+
 
 class AuthHeaderTestCase(unittest.TestCase):
 
@@ -227,6 +1873,8 @@ def test_suite():
     testlayer_suite.layer = wsgiapp_layer
     suites.append(testlayer_suite)
 
+    suites.append(parallelBrowserTests())
+
     suites.append(unittest.defaultTestLoader.loadTestsFromName(__name__))
 
     return unittest.TestSuite(suites)
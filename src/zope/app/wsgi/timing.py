@@ -0,0 +1,41 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Timing of the phases of handling a request."""
+import time
+
+
+class PhaseTimer:
+    """Measure the time spent in consecutive phases.
+
+    Calling the timer ends the current phase and starts the next one.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.timings = {}
+        self._clock = clock
+        self._last = clock()
+
+    def __call__(self, phase):
+        now = self._clock()
+        self.timings[phase] = now - self._last
+        self._last = now
+
+    def getServerTiming(self):
+        """Return the timings as value of a ``Server-Timing`` header."""
+        return ', '.join('%s;dur=%.3f' % (phase, seconds * 1000)
+                         for phase, seconds in self.timings.items())
+
+
+def nullTimer(phase):
+    """A timer which does nothing, used if timing is disabled."""
@@ -0,0 +1,190 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Warm up the ZODB connection caches after a restart.
+
+The objects loaded in the caches of the connections of a database are
+saved to a file periodically and when the process exits.  After the next
+start, a background thread loads them into the caches of the connections
+in the pool again, so the first requests do not have to wait for them.
+"""
+import atexit
+import binascii
+import json
+import logging
+import os
+import threading
+
+from ZODB.POSException import POSKeyError
+
+
+logger = logging.getLogger(__name__)
+
+FILE_VERSION = 1
+
+
+def getHotOIDs(db, limit=None):
+    """Return the oids of the objects loaded in the connection caches.
+
+    Objects loaded by more connections come first, ties are broken by how
+    recently they were used.  Ghosts are ignored.
+
+    This relies on private API of ZODB, ``DB._connectionMap`` and the
+    ``_cache`` of connections, and reads the caches of connections in use
+    by other threads.  That is safe enough for collecting oids, as only
+    the order of the cache may change meanwhile.
+    """
+    scores = {}
+
+    def collect(connection):
+        # ``lru_items`` returns the least recently used objects first.
+        for position, (oid, obj) in enumerate(connection._cache.lru_items()):
+            if obj._p_changed is None:
+                continue
+            count, last = scores.get(oid, (0, 0))
+            scores[oid] = (count + 1, max(last, position))
+
+    db._connectionMap(collect)
+    oids = sorted(scores, key=scores.__getitem__, reverse=True)
+    return oids if limit is None else oids[:limit]
+
+
+def saveHotOIDs(db, path, limit=None):
+    """Write the oids returned by ``getHotOIDs`` to ``path``.
+
+    Return the number of oids written.  An existing file is left alone if
+    the caches are empty, e.g. because the database was closed already.
+    """
+    oids = getHotOIDs(db, limit)
+    if not oids:
+        return 0
+    data = {
+        'version': FILE_VERSION,
+        'database': db.database_name,
+        'oids': [binascii.hexlify(oid).decode('ascii') for oid in oids],
+    }
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+    return len(oids)
+
+
+def loadHotOIDs(path):
+    """Return the oids saved to ``path``, or an empty list."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    except ValueError:
+        logger.warning('Ignoring the corrupt cache warm-up file %s.', path)
+        return []
+    if data.get('version') != FILE_VERSION:
+        return []
+    return [binascii.unhexlify(oid) for oid in data['oids']]
+
+
+def warmUp(db, oids, connections=None, batch_size=100):
+    """Load the objects with the given oids into the connection caches.
+
+    ``connections`` connections (by default the pool size) are opened at
+    the same time, so each of them gets its own cache, and returned to the
+    pool afterwards.  Objects are prefetched in batches, which storages
+    supporting it, like RelStorage, load in bulk.  Return the number of
+    objects loaded.
+    """
+    if connections is None:
+        connections = db.getPoolSize()
+    # There is no point in loading more objects than the caches keep.
+    oids = oids[:db.getCacheSize()]
+    opened = [db.open() for i in range(connections)]
+    loaded = 0
+    try:
+        for connection in opened:
+            for start in range(0, len(oids), batch_size):
+                batch = oids[start:start + batch_size]
+                connection.prefetch(batch)
+                for oid in batch:
+                    try:
+                        connection.get(oid)._p_activate()
+                    except POSKeyError:
+                        # The object was removed by a pack.
+                        continue
+                    loaded += 1
+    finally:
+        for connection in opened:
+            connection.close()
+    return loaded
+
+
+class CacheWarmer:
+    """Warm up the caches of a database and save them for the next start.
+
+    ``start`` warms up the caches in a background thread from the oids
+    saved to ``path``.  The hot oids are saved again every ``interval``
+    seconds, unless it is None, and when the process exits.
+    """
+
+    def __init__(self, db, path, limit=10000, interval=300.0,
+                 connections=None):
+        self.db = db
+        self.path = path
+        self.limit = limit
+        self.interval = interval
+        self.connections = connections
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start the background thread and save at exit."""
+        self._thread = threading.Thread(
+            target=self._run, name='zope.app.wsgi.warmup', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=None):
+        """Stop the background thread and save the hot oids."""
+        atexit.unregister(self.stop)
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.save()
+
+    def warmUp(self):
+        oids = loadHotOIDs(self.path)
+        if not oids:
+            return 0
+        loaded = warmUp(self.db, oids, self.connections)
+        logger.info('Loaded %d objects into the caches of %s.',
+                    loaded, self.db.database_name)
+        return loaded
+
+    def save(self):
+        try:
+            return saveHotOIDs(self.db, self.path, self.limit)
+        except Exception:
+            logger.exception('Cannot save the hot oids to %s.', self.path)
+            return 0
+
+    def _run(self):
+        try:
+            self.warmUp()
+        except Exception:
+            logger.exception('Cannot warm up the caches of %s.',
+                             self.db.database_name)
+        if self.interval is None:
+            return
+        while not self._stopped.wait(self.interval):
+            self.save()
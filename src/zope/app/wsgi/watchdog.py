@@ -0,0 +1,117 @@
+##############################################################################
+#
+# Copyright (c) 2026 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""A watchdog reporting requests which take too long to publish.
+
+Pass a ``Watchdog`` to ``WSGIPublisherApplication``, which then registers
+each request while it is published.  A background thread logs the current
+stack of the threads publishing requests for longer than the threshold.
+"""
+import logging
+import sys
+import threading
+import time
+import traceback
+
+
+logger = logging.getLogger(__name__)
+
+
+class Watchdog:
+    """Track requests being published and report slow ones.
+
+    Every ``interval`` seconds (by default a quarter of the threshold) the
+    requests running for longer than ``threshold`` seconds are logged
+    together with the stack of their thread.  Each request is reported
+    once.  The background thread is started with the first request.
+    """
+
+    def __init__(self, threshold=30.0, interval=None):
+        self.threshold = threshold
+        self.interval = threshold / 4 if interval is None else interval
+        # Maps thread ids to (start time, path, request).  Only the thread
+        # publishing a request adds and removes it, which is atomic for
+        # dictionaries, so no lock is needed on the hot path.
+        self._requests = {}
+        self._reported = set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def enter(self, request, path):
+        """Register a request published by the current thread."""
+        if self._thread is None:
+            self.start()
+        self._requests[threading.get_ident()] = (
+            time.monotonic(), path, request)
+
+    def leave(self):
+        """Unregister the request published by the current thread."""
+        self._requests.pop(threading.get_ident(), None)
+
+    def inflight(self):
+        """Return information about the requests being published."""
+        now = time.monotonic()
+        result = []
+        for ident, (start, path, request) in list(self._requests.items()):
+            principal = getattr(request, 'principal', None)
+            result.append({
+                'thread': ident,
+                'path': path,
+                'principal': getattr(principal, 'id', None),
+                'started': start,
+                'duration': now - start,
+            })
+        return result
+
+    def check(self):
+        """Log the stacks of all requests running for too long."""
+        frames = sys._current_frames()
+        running = set()
+        for info in self.inflight():
+            key = (info['thread'], info['started'])
+            running.add(key)
+            if info['duration'] < self.threshold or key in self._reported:
+                continue
+            self._reported.add(key)
+            frame = frames.get(info['thread'])
+            stack = ''.join(traceback.format_stack(frame)) if frame else ''
+            logger.warning(
+                'Request for %s by %s has been running for %.1f seconds '
+                'in thread %s:\n%s', info['path'], info['principal'],
+                info['duration'], info['thread'], stack)
+        # Forget requests which are done.
+        self._reported &= running
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='zope.app.wsgi.watchdog',
+                    daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception('Checking for slow requests failed.')